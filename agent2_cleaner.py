@@ -1,25 +1,133 @@
 # agent2_cleaner.py
 
 # import spacy
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 import re
+import os
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from result_cache import ResultCache, make_key
+from categorizer import KeywordCategorizer
+from metrics import metrics
 
 # Load the spaCy English model
 # nlp = spacy.load('en_core_web_sm')
-# Import Flair
-from flair.data import Sentence
-from flair.models import SequenceTagger
-# Load the Flair NER model (it will download on first run)
-tagger = SequenceTagger.load('ner-english-ontonotes-fast')
 
-# Get the list of English stop words
-stop_words = set(stopwords.words('english'))
+# Flair (and torch behind it) and NLTK are slow to import and the NER model is large,
+# so nothing is loaded at import time. Everything is loaded on first use and then
+# shared by the whole process. This keeps serverless cold starts fast for requests
+# that never tag anything.
+NER_MODEL_NAME = 'ner-english-ontonotes-fast'
+# Optional directory holding a pre-warmed copy of the model (see prewarm_model_cache)
+NER_MODEL_DIR = os.environ.get("NER_MODEL_DIR")
+
+# How many sentences Flair tags per forward pass in process_articles
+NER_MINI_BATCH_SIZE = int(os.environ.get("NER_MINI_BATCH_SIZE", 32))
+
+# Parallel mode: how many worker processes tag articles, and how many articles each one
+# gets per task. 1 worker keeps everything in this process.
+CLEANER_WORKERS = int(os.environ.get("CLEANER_WORKERS", 1))
+CLEANER_BATCH_SIZE = int(os.environ.get("CLEANER_BATCH_SIZE", 64))
+
+# Results are cached by a hash of the raw content plus these versions.
+# Bump CLEANER_CACHE_VERSION whenever clean_text, the entity labels or the keyword matching
+# change (the keyword table itself has its own fingerprint in the key).
+CLEANER_CACHE_VERSION = 2
+NER_CACHE_MAX_ENTRIES = int(os.environ.get("NER_CACHE_MAX_ENTRIES", 50000))
+NER_CACHE_MAX_AGE_DAYS = float(os.environ.get("NER_CACHE_MAX_AGE_DAYS", 30))
+
+_tagger = None
+_splitter = None
+_stop_words = None
+_model_lock = threading.Lock()
+
+
+def _local_model_path(directory=None):
+    directory = directory or NER_MODEL_DIR
+    return os.path.join(directory, f"{NER_MODEL_NAME}.pt") if directory else None
+
+
+def get_tagger():
+    """Returns the process-wide Flair NER model, loading it on first use."""
+    global _tagger
+    if _tagger is None:
+        with _model_lock:
+            if _tagger is None:
+                from flair.models import SequenceTagger
+
+                start = time.perf_counter()
+                local_path = _local_model_path()
+                model = local_path if local_path and os.path.exists(local_path) else NER_MODEL_NAME
+                # Load the Flair NER model (it will download on first run)
+                _tagger = SequenceTagger.load(model)
+                print(f"Loaded Flair NER model '{model}' in {time.perf_counter() - start:.1f}s.")
+    return _tagger
+
+
+def get_splitter():
+    """Returns the shared sentence splitter used for batched tagging."""
+    global _splitter
+    if _splitter is None:
+        with _model_lock:
+            if _splitter is None:
+                from flair.splitter import SegtokSentenceSplitter
+                _splitter = SegtokSentenceSplitter()
+    return _splitter
+
+
+def get_stop_words():
+    """Returns the set of English stop words, loading it from NLTK on first use."""
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+        _stop_words = set(stopwords.words('english'))
+    return _stop_words
+
+
+def prewarm_model_cache(directory=None):
+    """
+    Saves the NER model into `directory` (NER_MODEL_DIR by default), so later cold starts
+    load it from local disk instead of resolving and downloading it. Run it at build time.
+    """
+    path = _local_model_path(directory)
+    if not path:
+        raise ValueError("Set NER_MODEL_DIR or pass a directory to pre-warm the model cache.")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    get_tagger().save(path)
+    print(f"Saved NER model to {path}")
+    return path
 
 class CleanerTaggerAgent:
-    def __init__(self):
+    def __init__(self, use_cache=True, categorizer=None):
+        # The keyword matcher is compiled once here instead of on every article
+        self.categorizer = categorizer or KeywordCategorizer.from_config()
+        # Repeated content (wire stories under several URLs, unchanged pages) is served
+        # from this cache and never reaches Flair again
+        self.cache = None
+        if use_cache:
+            self.cache = ResultCache(
+                'ner',
+                max_entries=NER_CACHE_MAX_ENTRIES,
+                max_age=NER_CACHE_MAX_AGE_DAYS * 24 * 3600,
+            )
+        # Worker processes for parallel tagging, started on first use and kept until close()
+        self._executor = None
+        self._executor_workers = 0
         print("Cleaner & Tagger Agent is ready (using Flair).")
 
+    def _cache_key(self, raw_content):
+        return make_key(CLEANER_CACHE_VERSION, NER_MODEL_NAME, self.categorizer.fingerprint, raw_content)
+
+    @staticmethod
+    def _apply_result(article, result):
+        """Copies a cached/computed result onto an article (each article gets its own entity lists)."""
+        article['clean_content'] = result['clean_content']
+        article['entities'] = {label: list(names) for label, names in result['entities'].items()}
+        article['category'] = result['category']
+        return article
+
     def clean_text(self, text):
         """Removes noise, special characters, and extra whitespace."""
         text = re.sub(r'http\S+', '', text)
@@ -28,13 +136,9 @@ class CleanerTaggerAgent:
         text = ' '.join(text.split())
         return text
 
-def extract_entities(self, text):
-        """Uses Flair to extract named entities."""
-        sentence = Sentence(text)
-        tagger.predict(sentence)
-        
-        entities = {}
-        for entity in sentence.get_spans('ner'):
+    def _collect_entities(self, spans, entities):
+        """Adds Flair entity spans to an `entities` dict, normalizing the labels."""
+        for entity in spans:
             label = entity.tag  # e.g., 'PER', 'ORG', 'LOC'
             entity_text = entity.text
             
@@ -53,38 +157,25 @@ def extract_entities(self, text):
                     entities[label].append(entity_text)
         return entities
 
+    def extract_entities(self, text):
+        """Uses Flair to extract named entities."""
+        from flair.data import Sentence
+        sentence = Sentence(text)
+        get_tagger().predict(sentence)
+        return self._collect_entities(sentence.get_spans('ner'), {})
+
     def categorize_article(self, text):
-        """Assigns a category based on keywords found in the text."""
-        text = text.lower() # Use lowercase text for matching
-        
-        # Define keywords for each category
-        categories = {
-            'Technology': ['ai', 'tech', 'apple', 'google', 'microsoft', 'software', 'startup'],
-            'Business': ['stock', 'market', 'ceo', 'company', 'economy', 'finance', 'inc'],
-            'Sports': ['game', 'team', 'player', 'score', 'match', 'league'],
-            'Health': ['health', 'medical', 'doctor', 'hospital', 'disease', 'virus']
-        }
-        
-        # Count keyword occurrences for each category
-        category_scores = {cat: 0 for cat in categories}
-        for category, keywords in categories.items():
-            for keyword in keywords:
-                if keyword in text:
-                    category_scores[category] += 1
-                    
-        # Find the category with the highest score
-        # The max function with a key returns the key with the highest value
-        top_category = max(category_scores, key=category_scores.get)
-        
-        # Only assign the category if at least one keyword was found
-        if category_scores[top_category] > 0:
-            return top_category
-        else:
-            return 'General'
+        """Assigns a category based on whole-word keywords found in the text."""
+        return self.categorizer.categorize(text)
 
     def process_article(self, article):
         """The main function to process a single article dictionary."""
         raw_content = article.get('content', '')
+
+        key = self._cache_key(raw_content)
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            return self._apply_result(article, cached)
         
         # 1. Clean the text
         clean_content = self.clean_text(raw_content)
@@ -96,11 +187,129 @@ def extract_entities(self, text):
         category = self.categorize_article(clean_content)
         
         # Update the article dictionary
-        article['clean_content'] = clean_content
-        article['entities'] = entities
-        article['category'] = category # Add the category
+        result = {'clean_content': clean_content, 'entities': entities, 'category': category}
+        if self.cache:
+            self.cache.set(key, result)
         
-        return article
+        return self._apply_result(article, result)
+
+    def _tag_batch(self, contents, mini_batch_size):
+        """
+        Cleans, tags and categorizes a list of raw texts. Every text is split into sentences
+        and the whole corpus goes through a single batched `tagger.predict` call, which is
+        much faster than tagging one article at a time.
+        """
+        sentences = []
+        owners = []  # owners[i] is the index of the text sentences[i] came from
+        for index, raw_content in enumerate(contents):
+            if not raw_content.strip():
+                continue
+            for sentence in get_splitter().split(raw_content):
+                sentences.append(sentence)
+                owners.append(index)
+
+        if sentences:
+            with metrics.timer('ner'):
+                get_tagger().predict(sentences, mini_batch_size=mini_batch_size)
+
+        all_entities = [{} for _ in contents]
+        for sentence, index in zip(sentences, owners):
+            self._collect_entities(sentence.get_spans('ner'), all_entities[index])
+
+        results = []
+        for raw_content, entities in zip(contents, all_entities):
+            clean_content = self.clean_text(raw_content)
+            with metrics.timer('categorize'):
+                category = self.categorize_article(clean_content)
+            results.append({
+                'clean_content': clean_content,
+                'entities': entities,
+                'category': category,
+            })
+        return results
+
+    def _get_executor(self, workers):
+        """The agent's process pool, so workers (and their loaded taggers) outlive a single call."""
+        if self._executor is not None and self._executor_workers != workers:
+            self.close()
+        if self._executor is None:
+            # 'spawn' gives every worker a clean interpreter; forking a process that already
+            # holds torch threads can deadlock
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.categorizer,),
+            )
+            self._executor_workers = workers
+        return self._executor
+
+    def close(self):
+        """Shuts down the worker processes, if any were started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = 0
+
+    def _tag_parallel(self, contents, workers, mini_batch_size):
+        """
+        Spreads batches of texts over the agent's pool of worker processes. Each worker loads
+        the tagger once in its initializer, and results come back in the original order.
+        """
+        batches = [contents[i:i + CLEANER_BATCH_SIZE] for i in range(0, len(contents), CLEANER_BATCH_SIZE)]
+        print(f"Tagging {len(contents)} articles in {len(batches)} batches on {workers} worker processes...")
+        executor = self._get_executor(workers)
+        results = []
+        for batch_results in executor.map(_tag_batch_in_worker, batches, [mini_batch_size] * len(batches)):
+            results.extend(batch_results)
+        return results
+
+    def process_articles(self, articles, mini_batch_size=NER_MINI_BATCH_SIZE, workers=None):
+        """
+        Processes a batch of articles. Content we have seen before comes from the cache,
+        and each distinct new content is tagged once in a single batched Flair call.
+        With `workers` > 1 (or CLEANER_WORKERS) the new content is tagged by a process pool.
+        """
+        keys = [self._cache_key(article.get('content', '')) for article in articles]
+        cached = self.cache.get_many(keys) if self.cache else {}
+
+        pending = {}
+        for key, article in zip(keys, articles):
+            if key not in cached and key not in pending:
+                pending[key] = article.get('content', '')
+
+        contents = list(pending.values())
+        workers = CLEANER_WORKERS if workers is None else workers
+        if workers > 1 and len(contents) > CLEANER_BATCH_SIZE:
+            results = self._tag_parallel(contents, workers, mini_batch_size)
+        else:
+            results = self._tag_batch(contents, mini_batch_size)
+
+        fresh = dict(zip(pending, results))
+        if self.cache and fresh:
+            self.cache.set_many(fresh)
+        if cached:
+            print(f"NER cache: {len(articles) - len(pending)} of {len(articles)} articles served from cache.")
+
+        for key, article in zip(keys, articles):
+            self._apply_result(article, cached.get(key) or fresh[key])
+
+        return articles
+
+
+# --- PROCESS POOL WORKERS ---
+# Each worker process keeps its own agent and model; the parent process owns the cache.
+_worker_agent = None
+
+
+def _init_worker(categorizer):
+    global _worker_agent
+    _worker_agent = CleanerTaggerAgent(use_cache=False, categorizer=categorizer)
+    get_tagger()
+
+
+def _tag_batch_in_worker(contents, mini_batch_size):
+    return _worker_agent._tag_batch(contents, mini_batch_size)
 
 # --- EXAMPLE USAGE ---
 if __name__ == "__main__":
@@ -1,9 +1,16 @@
 # agent3_summarizer.py
 import os
+import asyncio
+import json
+import random
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 import google.generativeai as genai
+from result_cache import ResultCache, make_key
+from metrics import metrics
 
 # --- CONFIGURATION ---
 # IMPORTANT: Store your key securely. Don't hardcode it in production.
@@ -14,12 +21,197 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 # Configure the generative AI library with your key
 genai.configure(api_key=GEMINI_API_KEY)
 
+MODEL_NAME = 'gemini-1.5-pro'
+# Bump this whenever build_prompt changes, so cached summaries from the old prompt are not reused
+PROMPT_VERSION = 2
+
+# Long pages are cut to this many (estimated) tokens before they are sent to the model
+MAX_ARTICLE_TOKENS = int(os.environ.get("MAX_ARTICLE_TOKENS", 1500))
+# Batching mode: pack up to this many articles into one request (1 = one article per request),
+# keeping the packed articles under PACK_TOKEN_BUDGET tokens in total
+SUMMARIZER_PACK_SIZE = int(os.environ.get("SUMMARIZER_PACK_SIZE", 1))
+PACK_TOKEN_BUDGET = int(os.environ.get("PACK_TOKEN_BUDGET", 8000))
+
+# Summaries are cached by content hash + model + prompt version
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", 20000))
+SUMMARY_CACHE_TTL_HOURS = float(os.environ.get("SUMMARY_CACHE_TTL_HOURS", 24 * 7))
+
+# --- BATCH SUMMARIZATION SETTINGS ---
+# Limits for summarize_articles: requests in flight, requests/tokens per minute
+# (match these to your Gemini quota), retries on 429/5xx and a deadline for the whole run.
+SUMMARIZER_CONCURRENCY = int(os.environ.get("SUMMARIZER_CONCURRENCY", 8))
+GEMINI_RPM = float(os.environ.get("GEMINI_RPM", 60))
+GEMINI_TPM = float(os.environ.get("GEMINI_TPM", 1000000))
+SUMMARIZER_MAX_RETRIES = int(os.environ.get("SUMMARIZER_MAX_RETRIES", 4))
+SUMMARIZER_BACKOFF_SECONDS = float(os.environ.get("SUMMARIZER_BACKOFF_SECONDS", 1.0))
+SUMMARIZER_DEADLINE_SECONDS = float(os.environ.get("SUMMARIZER_DEADLINE_SECONDS", 120))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Summary of an article that was cancelled by the deadline; the pipeline retries these on its next run
+DEADLINE_EXCEEDED_SUMMARY = "Error: Summarization deadline exceeded."
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), good enough for rate limiting."""
+    return max(1, len(text) // 4)
+
+
+def truncate_to_tokens(text, max_tokens=MAX_ARTICLE_TOKENS):
+    """Cuts text to roughly `max_tokens` tokens, on a word boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0]
+
+
+def parse_packed_summaries(text):
+    """
+    Parses the JSON array a packed request should come back with into {id: summary}.
+    Returns an empty dict if the reply is not valid JSON.
+    """
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    summaries = {}
+    for item in items:
+        if isinstance(item, dict) and 'id' in item and isinstance(item.get('summary'), str):
+            try:
+                summaries[int(item['id'])] = item['summary'].strip()
+            except (TypeError, ValueError):
+                continue
+    return {i: summary for i, summary in summaries.items() if summary}
+
+
+def is_retryable_error(error):
+    """True for rate limits (429) and server errors (5xx), which are worth retrying."""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'InternalServerError',
+                                    'ServiceUnavailable', 'DeadlineExceeded')
+
+
+class RateLimiter:
+    """
+    A token bucket that enforces both a requests-per-minute and a tokens-per-minute limit.
+    Both buckets start full and refill continuously.
+    The buckets sit behind a thread lock and waiting is done outside it, so one limiter can be
+    shared by several threads, each with its own event loop (e.g. repeated asyncio.run calls).
+    """
+
+    def __init__(self, requests_per_minute=GEMINI_RPM, tokens_per_minute=GEMINI_TPM):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _try_take(self, tokens):
+        """Takes one request and `tokens` tokens if both fit; otherwise returns how long to wait."""
+        with self._lock:
+            self._refill()
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0
+            wait_requests = (1 - self._requests) * 60 / self.requests_per_minute
+            wait_tokens = (tokens - self._tokens) * 60 / self.tokens_per_minute
+            return max(wait_requests, wait_tokens, 0.001)
+
+    async def acquire(self, tokens=1):
+        """Waits until one request carrying `tokens` tokens fits under both limits."""
+        # A single prompt bigger than the whole minute's budget would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            wait = self._try_take(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
 class SummarizerAgent:
-    def __init__(self):
-        # Initialize the Gemini Pro model
-        self.model = genai.GenerativeModel('gemini-1.5-pro')
+    def __init__(self, model=None, use_cache=True):
+        # Initialize the Gemini Pro model. Any object with generate_content /
+        # generate_content_async can be passed instead, e.g. a local stub for testing.
+        self.model = model or genai.GenerativeModel(MODEL_NAME)
+        self.model_name = getattr(self.model, 'model_name', MODEL_NAME)
+        # Unchanged articles get their summary from here and never cost a model call
+        self.cache = None
+        if use_cache:
+            self.cache = ResultCache(
+                'summaries',
+                max_entries=SUMMARY_CACHE_MAX_ENTRIES,
+                max_age=SUMMARY_CACHE_TTL_HOURS * 3600,
+            )
         print("Summarizer Agent is ready and connected to Gemini.")
 
+    def _cache_key(self, content):
+        return make_key(self.model_name, PROMPT_VERSION, content)
+
+    def _store_summaries(self, keyed_articles):
+        """Caches the summaries that succeeded; errors are retried on the next run."""
+        if not self.cache:
+            return
+        results = {
+            key: article['summary'] for key, article in keyed_articles
+            if article.get('summary') and not article['summary'].startswith('Error')
+        }
+        self.cache.set_many(results)
+
+    def build_prompt(self, content_to_summarize):
+        """This is our "prompt" - the instruction we give to the AI"""
+        content_to_summarize = truncate_to_tokens(content_to_summarize)
+        return f"""
+        Summarize the following news article into a neutral, factual summary of 60 words or less.
+        Focus only on the key facts (who, what, where, when) and remove any opinionated language.
+
+        Article: "{content_to_summarize}"
+
+        Summary:
+        """
+
+    def build_packed_prompt(self, contents):
+        """One request for several articles; the model answers with one summary per article id."""
+        articles = '\n'.join(
+            f'<article id="{i}">\n{truncate_to_tokens(content)}\n</article>'
+            for i, content in enumerate(contents, 1)
+        )
+        return f"""
+        Summarize each of the following news articles into a neutral, factual summary of 60 words or less.
+        Focus only on the key facts (who, what, where, when) and remove any opinionated language.
+
+        Return only a JSON array with one object per article, in the same order, like:
+        [{{"id": 1, "summary": "..."}}, {{"id": 2, "summary": "..."}}]
+
+        {articles}
+        """
+
+    def make_packs(self, articles, pack_size=SUMMARIZER_PACK_SIZE, token_budget=PACK_TOKEN_BUDGET):
+        """Groups articles into packs of at most `pack_size` that fit in `token_budget` tokens."""
+        packs, current, current_tokens = [], [], 0
+        for article in articles:
+            tokens = estimate_tokens(truncate_to_tokens(article['clean_content']))
+            if current and (len(current) >= pack_size or current_tokens + tokens > token_budget):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append(article)
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        return packs
+
     def summarize_article(self, article):
         """
         Generates a summary for the article's content using the Gemini model.
@@ -32,25 +224,25 @@ class SummarizerAgent:
             article['summary'] = "Error: No content provided for summarization."
             return article
             
-        # This is our "prompt" - the instruction we give to the AI
-        prompt = f"""
-        Summarize the following news article into a neutral, factual summary of 60 words or less.
-        Focus only on the key facts (who, what, where, when) and remove any opinionated language.
-
-        Article: "{content_to_summarize}"
+        key = self._cache_key(content_to_summarize)
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            article['summary'] = cached
+            return article
 
-        Summary:
-        """
+        prompt = self.build_prompt(content_to_summarize)
         
         try:
             # Send the prompt to the model
-            response = self.model.generate_content(prompt)
+            with metrics.timer('llm'):
+                response = self.model.generate_content(prompt)
             
             # Extract the summary text from the response
             summary = response.text.strip()
             
             # Add the summary to our article dictionary
             article['summary'] = summary
+            self._store_summaries([(key, article)])
             
         except Exception as e:
             print(f"An error occurred during summarization: {e}")
@@ -58,6 +250,133 @@ class SummarizerAgent:
             
         return article
 
+    async def _summarize_one_async(self, article, limiter, semaphore):
+        """Summarizes one article through the async client, retrying 429/5xx with exponential backoff."""
+        content_to_summarize = article.get('clean_content')
+        if not content_to_summarize:
+            print("Warning: No content to summarize.")
+            article['summary'] = "Error: No content provided for summarization."
+            return article
+
+        prompt = self.build_prompt(content_to_summarize)
+        try:
+            async with semaphore:
+                text = await self._generate_async(prompt, limiter)
+            article['summary'] = text.strip()
+        except Exception as e:
+            print(f"An error occurred during summarization: {e}")
+            article['summary'] = f"Error: Could not generate summary. {e}"
+        return article
+
+    async def _generate_async(self, prompt, limiter):
+        """Sends one prompt through the rate limiter, retrying 429/5xx with exponential backoff."""
+        for attempt in range(SUMMARIZER_MAX_RETRIES + 1):
+            await limiter.acquire(estimate_tokens(prompt))
+            try:
+                with metrics.timer('llm'):
+                    response = await self.model.generate_content_async(prompt)
+                return response.text
+            except Exception as e:
+                if attempt < SUMMARIZER_MAX_RETRIES and is_retryable_error(e):
+                    metrics.inc('llm_retries_total')
+                    # 1s, 2s, 4s... plus jitter so retries don't arrive in lockstep
+                    delay = SUMMARIZER_BACKOFF_SECONDS * (2 ** attempt)
+                    await asyncio.sleep(delay + random.uniform(0, SUMMARIZER_BACKOFF_SECONDS))
+                    continue
+                raise
+
+    async def _summarize_pack_async(self, pack, limiter, semaphore):
+        """
+        Summarizes several articles with one request. Articles whose summary is missing
+        from the reply (or all of them, if it can't be parsed) fall back to single requests.
+        """
+        prompt = self.build_packed_prompt([a['clean_content'] for a in pack])
+        summaries = {}
+        try:
+            async with semaphore:
+                summaries = parse_packed_summaries(await self._generate_async(prompt, limiter))
+        except Exception as e:
+            print(f"Packed summarization failed, falling back to single requests: {e}")
+
+        missing = []
+        for i, article in enumerate(pack, 1):
+            if i in summaries:
+                article['summary'] = summaries[i]
+            else:
+                missing.append(article)
+        if missing:
+            print(f"Packed reply was missing {len(missing)} of {len(pack)} summaries, retrying them one by one.")
+            await asyncio.gather(*(self._summarize_one_async(a, limiter, semaphore) for a in missing))
+        return pack
+
+    async def summarize_articles_async(self, articles, concurrency=SUMMARIZER_CONCURRENCY,
+                                       deadline=SUMMARIZER_DEADLINE_SECONDS, limiter=None,
+                                       pack_size=SUMMARIZER_PACK_SIZE):
+        """
+        Summarizes a batch of articles concurrently. Requests go through a token-bucket
+        rate limiter, and anything still unfinished when `deadline` seconds have passed
+        is cancelled and marked with an error summary.
+        With `pack_size` > 1 several articles share one request (see make_packs).
+        """
+        if not articles:
+            return articles
+
+        # Serve what we can from the cache; only the misses go to the model,
+        # and identical content within the batch is only summarized once
+        to_summarize = [(None, a) for a in articles if not a.get('clean_content')]
+        duplicates = []
+        if self.cache:
+            keyed = [(self._cache_key(a['clean_content']), a) for a in articles if a.get('clean_content')]
+            cached = self.cache.get_many(key for key, _ in keyed)
+            first_by_key = {}
+            for key, article in keyed:
+                if key in cached:
+                    article['summary'] = cached[key]
+                elif key in first_by_key:
+                    duplicates.append((key, article))
+                else:
+                    first_by_key[key] = article
+            to_summarize += list(first_by_key.items())
+            print(f"Summary cache: {len(cached)} hits, {len(first_by_key)} misses "
+                  f"(lifetime hit rate {self.cache.stats()['hit_rate']:.0%}).")
+        else:
+            to_summarize += [(None, a) for a in articles if a.get('clean_content')]
+
+        limiter = limiter or RateLimiter()
+        semaphore = asyncio.Semaphore(concurrency)
+        for _, article in to_summarize:
+            article.pop('summary', None)
+
+        with_content = [a for _, a in to_summarize if a.get('clean_content')]
+        if pack_size > 1:
+            jobs = [self._summarize_pack_async(pack, limiter, semaphore) for pack in self.make_packs(with_content, pack_size)]
+            jobs += [self._summarize_one_async(a, limiter, semaphore) for _, a in to_summarize if not a.get('clean_content')]
+        else:
+            jobs = [self._summarize_one_async(a, limiter, semaphore) for _, a in to_summarize]
+        tasks = [asyncio.create_task(job) for job in jobs]
+
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+        if pending:
+            print(f"Summarization deadline of {deadline}s hit, cancelling {len(pending)} requests.")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for _, article in to_summarize:
+                if 'summary' not in article:
+                    article['summary'] = DEADLINE_EXCEEDED_SUMMARY
+
+        summaries = {key: a['summary'] for key, a in to_summarize if key is not None}
+        for key, article in duplicates:
+            article['summary'] = summaries[key]
+        self._store_summaries((key, a) for key, a in to_summarize if key is not None)
+        return articles
+
+    def summarize_articles(self, articles, **kwargs):
+        """Blocking wrapper around summarize_articles_async for scripts and background jobs."""
+        return asyncio.run(self.summarize_articles_async(articles, **kwargs))
+
 # --- EXAMPLE USAGE ---
 if __name__ == "__main__":
     # This is a sample output from Agent 2
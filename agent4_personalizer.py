@@ -1,10 +1,60 @@
 # agent4_personalizer.py
 
-def record_user_interaction(user_profile, article):
+import heapq
+import os
+import time
+
+# Score weights: a matching category counts more than a matching entity
+CATEGORY_WEIGHT = 1.5
+ENTITY_WEIGHT = 1.0
+
+# Interest weights halve every INTEREST_HALF_LIFE_DAYS, so recent reading outweighs old reading.
+# Weights that decay below MIN_INTEREST_WEIGHT are dropped, and only the strongest
+# MAX_PROFILE_ENTITIES entities are kept, which bounds both the stored profile and ranking cost.
+INTEREST_HALF_LIFE_DAYS = float(os.environ.get("INTEREST_HALF_LIFE_DAYS", 14))
+MIN_INTEREST_WEIGHT = float(os.environ.get("MIN_INTEREST_WEIGHT", 0.05))
+MAX_PROFILE_ENTITIES = int(os.environ.get("MAX_PROFILE_ENTITIES", 200))
+
+
+def decay_profile(user_profile, now=None, half_life_days=INTEREST_HALF_LIFE_DAYS):
+    """
+    Decays every weight by the time passed since the profile's `updated_at` (epoch seconds).
+    All weights shrink by the same factor, so rankings don't change between writes and
+    the decay only has to be applied when the profile is updated.
+    """
+    now = time.time() if now is None else now
+    updated_at = user_profile.get('updated_at')
+    if updated_at is not None and now > updated_at:
+        factor = 0.5 ** ((now - updated_at) / (half_life_days * 86400))
+        for key in ('categories', 'entities'):
+            weights = user_profile.get(key, {})
+            for name in weights:
+                weights[name] *= factor
+    user_profile['updated_at'] = max(now, updated_at or now)
+    return user_profile
+
+
+def prune_profile(user_profile, min_weight=MIN_INTEREST_WEIGHT, max_entities=MAX_PROFILE_ENTITIES):
+    """Drops weights below `min_weight` and keeps only the `max_entities` strongest entities."""
+    categories = user_profile.get('categories', {})
+    user_profile['categories'] = {name: round(w, 4) for name, w in categories.items() if w >= min_weight}
+    entities = [(name, w) for name, w in user_profile.get('entities', {}).items() if w >= min_weight]
+    if len(entities) > max_entities:
+        entities = heapq.nlargest(max_entities, entities, key=lambda item: item[1])
+    user_profile['entities'] = {name: round(w, 4) for name, w in entities}
+    return user_profile
+
+
+def record_user_interaction(user_profile, article, now=None):
     """
     Updates a user's profile based on an article they interacted with.
     This simulates a user reading/liking an article.
+    Existing interests are decayed first and the profile is pruned afterwards.
     """
+    user_profile.setdefault('categories', {})
+    user_profile.setdefault('entities', {})
+    decay_profile(user_profile, now)
+
     # Increase score for the article's category
     category = article.get('category', 'General')
     if category not in user_profile['categories']:
@@ -12,14 +62,51 @@ def record_user_interaction(user_profile, article):
     user_profile['categories'][category] += 1.0  # Increment category score
 
     # Increase score for each entity in the article
-    entities = article.get('entities', {})
+    entities = article.get('entities') or {}
     for ent_type, ent_list in entities.items():
         for entity_name in ent_list:
             if entity_name not in user_profile['entities']:
                 user_profile['entities'][entity_name] = 0
             user_profile['entities'][entity_name] += 0.5 # Increment entity score (less than category)
-            
-    return user_profile
+
+    return prune_profile(user_profile)
+
+
+class ArticleIndex:
+    """
+    An inverted index from category and entity name to the articles that have them.
+    Build it once per batch of articles; ranking then only looks at the articles that
+    share a key with the user's profile instead of scanning every article.
+    """
+
+    def __init__(self, articles):
+        self.articles = list(articles)
+        self.by_category = {}  # category -> [article position]
+        self.by_entity = {}  # entity name -> [(article position, times it is listed)]
+        for position, article in enumerate(self.articles):
+            category = article.get('category', 'General')
+            self.by_category.setdefault(category, []).append(position)
+
+            counts = {}
+            for ent_type, ent_list in (article.get('entities') or {}).items():
+                for entity_name in ent_list:
+                    counts[entity_name] = counts.get(entity_name, 0) + 1
+            for entity_name, count in counts.items():
+                self.by_entity.setdefault(entity_name, []).append((position, count))
+
+    def __len__(self):
+        return len(self.articles)
+
+    def score(self, user_profile):
+        """Returns {article position: score} for every article that matches the profile."""
+        scores = {}
+        for category, weight in user_profile['categories'].items():
+            for position in self.by_category.get(category, ()):
+                scores[position] = scores.get(position, 0.0) + weight * CATEGORY_WEIGHT
+        for entity_name, weight in user_profile['entities'].items():
+            for position, count in self.by_entity.get(entity_name, ()):
+                scores[position] = scores.get(position, 0.0) + weight * ENTITY_WEIGHT * count
+        return scores
 
 
 class PersonalizationAgent:
@@ -34,32 +121,53 @@ class PersonalizationAgent:
         # 1. Category Score
         article_category = article.get('category', 'General')
         if article_category in user_profile['categories']:
-            score += user_profile['categories'][article_category] * 1.5 # Weight category matches higher
+            score += user_profile['categories'][article_category] * CATEGORY_WEIGHT # Weight category matches higher
 
         # 2. Entity Score
-        article_entities = article.get('entities', {})
+        article_entities = article.get('entities') or {}
         for ent_type, ent_list in article_entities.items():
             for entity_name in ent_list:
                 if entity_name in user_profile['entities']:
-                    score += user_profile['entities'][entity_name] * 1.0 # Weight entity matches
+                    score += user_profile['entities'][entity_name] * ENTITY_WEIGHT # Weight entity matches
 
         return score
 
-    def rank_articles_for_user(self, user_profile, articles):
-        """Ranks a list of articles based on relevance scores."""
-        
-        scored_articles = []
-        for article in articles:
-            # Calculate score for each article
-            score = self.calculate_relevance_score(user_profile, article)
-            # Store the article and its score
-            scored_articles.append({'article': article, 'score': score})
-            
-        # Sort the articles in descending order based on the score
-        ranked_list = sorted(scored_articles, key=lambda x: x['score'], reverse=True)
+    def rank_articles_for_user(self, user_profile, articles, top_k=None):
+        """
+        Ranks articles based on relevance scores.
+        `articles` can be a list or a prebuilt ArticleIndex. Only articles that match the
+        profile are scored, and with `top_k` a heap picks the best ones without a full sort.
+        The order is the same as sorting every article by score: ties and unmatched
+        articles keep their original order.
+        """
+        index = articles if isinstance(articles, ArticleIndex) else ArticleIndex(articles)
+        scores = self.score_matches(user_profile, index)
+        limit = len(index) if top_k is None else min(top_k, len(index))
+
+        # Best score first, earlier article first on ties
+        order_key = lambda item: (-item[1], item[0])
+        if limit < len(scores):
+            best = heapq.nsmallest(limit, scores.items(), key=order_key)
+        else:
+            best = sorted(scores.items(), key=order_key)
+
+        ranked_list = [{'article': index.articles[position], 'score': score} for position, score in best]
+
+        # Fill up with the unmatched articles (score 0), in their original order
+        if len(ranked_list) < limit:
+            for position, article in enumerate(index.articles):
+                if position not in scores:
+                    ranked_list.append({'article': article, 'score': 0.0})
+                    if len(ranked_list) == limit:
+                        break
         
         return ranked_list
 
+    def score_matches(self, user_profile, index):
+        """Scores the articles in `index` that share a category or entity with the profile."""
+        # Matched articles with a total of 0 rank like unmatched ones
+        return {position: score for position, score in index.score(user_profile).items() if score > 0}
+
 
         # agent4_personalizer.py (continued)
 
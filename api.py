@@ -1,21 +1,63 @@
 # api.py (Updated with security scheme for docs)
 # jus checking
 
-from fastapi import FastAPI, Depends, HTTPException
+import base64
+import hmac
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Header
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, Response
 # Import the new security classes
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel
 from supabase import create_client, Client
 from typing import Optional
+import orjson
 import os
 # Import our personalization agent
 from agent4_personalizer import PersonalizationAgent
+from feed_cache import FeedCache
+from interactions import InteractionBuffer
+from repository import SupabaseRepository, FEED_ARTICLE_COLUMNS
+from auth import TokenVerifier, AuthenticatedUser, InvalidToken
+from metrics import metrics
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # --- INITIALIZATION ---
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Don't lose interactions still waiting in the buffer
+    await interaction_buffer.flush()
+
+
+app = FastAPI(lifespan=lifespan)
+# Feed pages are mostly repetitive JSON text, so they compress well
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>". Without a token it is closed, unless
+# METRICS_PUBLIC=1 opens it (only for deployments where the port isn't reachable from outside).
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "0") == "1"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # The route template (e.g. /feed) rather than the raw path keeps the label set small
+    route = request.scope.get('route')
+    path = route.path if route is not None else 'unmatched'
+    metrics.observe('http_request_seconds', time.perf_counter() - start, path=path)
+    metrics.inc('http_requests_total', path=path, status=response.status_code)
+    return response
 
 # Initialize Supabase client
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
@@ -25,10 +67,41 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 # Initialize the Personalization Agent
 personalization_agent = PersonalizationAgent()
 
+# How many recent articles are ranked per request, and how many make it into the feed.
+# Ranking goes through an inverted index and a heap, so a large candidate set stays cheap.
+FEED_CANDIDATES = int(os.environ.get("FEED_CANDIDATES", 2000))
+FEED_SIZE = int(os.environ.get("FEED_SIZE", 50))
+# Articles per page of /feed, and the fields each article has unless the client asks for others
+FEED_PAGE_SIZE = int(os.environ.get("FEED_PAGE_SIZE", 20))
+DEFAULT_FEED_FIELDS = ('headline', 'url', 'summary', 'category', 'score')
+FEED_FIELDS = set(FEED_ARTICLE_COLUMNS.split(',')) | {'score'}
+
+
+# Queries run on a thread pool so the blocking supabase client never stalls the event loop
+repository = SupabaseRepository(supabase)
+
+# Ranked feeds are cached per user and refreshed incrementally as new articles arrive
+feed_cache = FeedCache(personalization_agent, repository.get_user_profile, repository.get_recent_articles, FEED_SIZE, FEED_CANDIDATES)
+
+# Interactions are coalesced into batched profile writes, which also refresh the user's feed
+interaction_buffer = InteractionBuffer(repository, feed_cache)
+
 # Create an instance of the HTTPBearer security scheme
 security = HTTPBearer()
 
 
+def verify_token_remotely(token):
+    """Asks Supabase about a token we can't verify locally (HS256 without SUPABASE_JWT_SECRET)."""
+    user = supabase.auth.get_user(token).user
+    if not user:
+        raise InvalidToken("Invalid or expired token")
+    return AuthenticatedUser(user.id, user.email, user.role, {})
+
+
+# Tokens are verified locally and cached until they expire, so most requests skip the auth server
+token_verifier = TokenVerifier(remote_verify=verify_token_remotely)
+
+
 # --- AUTHENTICATION DEPENDENCY (UPDATED) ---
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -38,15 +111,59 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     """
     token = credentials.credentials
     try:
-        user_response = supabase.auth.get_user(token)
-        user = user_response.user
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-        return user
+        return await token_verifier.verify(token)
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
 
 
+# --- RESPONSE SHAPING ---
+
+def parse_fields(fields):
+    """Turns the `fields` query parameter into a tuple of field names."""
+    if not fields:
+        return DEFAULT_FEED_FIELDS
+    requested = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = [field for field in requested if field not in FEED_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def project(item, fields):
+    article = item['article']
+    return {field: item['score'] if field == 'score' else article.get(field) for field in fields}
+
+
+def encode_cursor(item):
+    raw = json.dumps({'score': item['score'], 'url': item['article'].get('url')}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(position['score']), position['url']
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_start(ranked_articles, cursor):
+    """
+    Index of the first article after the cursor. Cursors point at an article (score and url)
+    rather than an offset, so articles merged into the feed between two page requests
+    don't shift the next page.
+    """
+    if not cursor:
+        return 0
+    score, url = decode_cursor(cursor)
+    for index, item in enumerate(ranked_articles):
+        if item['article'].get('url') == url and item['score'] == score:
+            return index + 1
+        if item['score'] < score:
+            return index
+    return len(ranked_articles)
+
+
 # --- API ENDPOINTS ---
 
 @app.get("/")
@@ -54,27 +171,56 @@ def read_root():
     return {"message": "AI News App API is running!"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """Request, stage and cache metrics in the Prometheus text format."""
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(authorization or '', f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    elif not METRICS_PUBLIC:
+        raise HTTPException(status_code=403, detail="Metrics are disabled: set METRICS_TOKEN")
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/feed")
-async def get_personalized_feed(current_user: dict = Depends(get_current_user)):
-    # This endpoint's logic remains exactly the same
+async def get_personalized_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_SIZE),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Returns one page of the user's ranked feed. Pass `next_cursor` back as `cursor` for the
+    next page, and `fields` (comma-separated) to choose what each article includes.
+    """
     user_id = current_user.id
-    
-    try:
-        profile_response = supabase.table('user_profiles').select("interest_profile").eq('id', user_id).single().execute()
-        user_profile_data = profile_response.data
-        user_profile = {
-            "categories": user_profile_data.get('interest_profile', {}).get('categories', {}),
-            "entities": user_profile_data.get('interest_profile', {}).get('entities', {})
-        }
-    except Exception as e:
-        user_profile = {"categories": {}, "entities": {}}
+    fields = parse_fields(fields)
 
     try:
-        articles_response = supabase.table('articles').select("*").order('created_at', desc=True).limit(50).execute()
-        articles = articles_response.data
+        ranked_articles = await feed_cache.get_feed(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch articles: {e}")
 
-    ranked_articles = personalization_agent.rank_articles_for_user(user_profile, articles)
+    start = page_start(ranked_articles, cursor)
+    page = ranked_articles[start:start + limit]
+    has_more = start + limit < len(ranked_articles)
+    # orjson encodes the feed several times faster than the stdlib encoder
+    return Response(orjson.dumps({
+        "feed": [project(item, fields) for item in page],
+        "next_cursor": encode_cursor(page[-1]) if page and has_more else None,
+    }), media_type="application/json")
 
-    return {"feed": ranked_articles}
\ No newline at end of file
+
+class Interaction(BaseModel):
+    url: str
+
+
+@app.post("/interactions", status_code=202)
+async def record_interaction(interaction: Interaction, current_user: dict = Depends(get_current_user)):
+    """
+    Records that the user read or liked an article. The interest profile is updated in the
+    background, within a few seconds, and the next /feed reflects it.
+    """
+    if not interaction_buffer.add(current_user.id, interaction.url):
+        raise HTTPException(status_code=429, detail="Too many interactions, try again shortly")
+    return {"queued": True}
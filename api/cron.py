@@ -2,12 +2,11 @@
 
 from fastapi import FastAPI, BackgroundTasks, HTTPException
 import os
+import time
 
 # IMPORTANT: Make sure your agent files are in the root directory
 # so they can be imported correctly.
-from harvester import run_harvester
-from agent2_cleaner import CleanerTaggerAgent
-from agent3_summarizer import SummarizerAgent
+from pipeline import run_pipeline
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -15,11 +14,17 @@ load_dotenv()
 
 app = FastAPI()
 
+# Keep in sync with maxDuration for api/cron.py in vercel.json. The pipeline stops taking
+# new articles well before this, stores what it has, and the next trigger resumes from there.
+CRON_MAX_DURATION_SECONDS = float(os.environ.get("CRON_MAX_DURATION_SECONDS", 300))
+
 # --- PIPELINE LOGIC ---
-def run_full_pipeline():
+def run_full_pipeline(incremental=True):
     """
-    The complete pipeline logic from main.py, refactored into a function.
+    Runs the same pipeline as main.py (see pipeline.py).
+    In incremental mode only new or changed articles are processed.
     """
+    started = time.monotonic()
     print("--- PIPELINE STARTED ---")
     # Initialize Supabase client inside the function
     # This is crucial for serverless environments.
@@ -27,24 +32,12 @@ def run_full_pipeline():
     supabase_key = os.environ.get("SUPABASE_KEY")
     supabase: Client = create_client(supabase_url, supabase_key)
 
-    cleaner_agent = CleanerTaggerAgent()
-    summarizer_agent = SummarizerAgent()
-
-    raw_articles = run_harvester()
-    if not raw_articles:
-        print("Harvester found no articles.")
-        return
-
-    articles_to_upload = []
-    for article in raw_articles:
-        cleaned_article = cleaner_agent.process_article(article)
-        final_article = summarizer_agent.summarize_article(cleaned_article)
-        db_record = { 'headline': final_article.get('headline'), 'url': final_article.get('url'), 'summary': final_article.get('summary'), 'category': final_article.get('category'), 'entities': final_article.get('entities'), 'content': final_article.get('content') }
-        articles_to_upload.append(db_record)
-
-    if articles_to_upload:
-        supabase.table('articles').upsert(articles_to_upload, on_conflict='url').execute()
-        print(f"--- PIPELINE COMPLETE: Uploaded {len(articles_to_upload)} articles. ---")
+    time_budget = CRON_MAX_DURATION_SECONDS - (time.monotonic() - started)
+    counts = run_pipeline(supabase, incremental=incremental, time_budget=time_budget)
+    if counts.get('deferred'):
+        print(f"--- PIPELINE PAUSED: Uploaded {counts['uploaded']} articles, the rest is left for the next run. ---")
+    else:
+        print(f"--- PIPELINE COMPLETE: Uploaded {counts['uploaded']} articles. ---")
 
 # --- API ENDPOINT FOR THE CRON JOB ---
 @app.post("/cron")
@@ -0,0 +1,170 @@
+# auth.py
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import requests
+from jose import jwt, JWTError
+
+from metrics import metrics
+
+# --- CONFIGURATION ---
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+# Projects that still sign tokens with the shared HS256 secret set this;
+# projects on asymmetric signing keys are verified against the JWKS endpoint
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWKS_URL = os.environ.get(
+    "SUPABASE_JWKS_URL", f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+)
+JWKS_CACHE_SECONDS = int(os.environ.get("JWKS_CACHE_SECONDS", 600))
+# An unknown key id triggers a JWKS refetch, but not more often than this
+JWKS_MIN_REFETCH_SECONDS = 30
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", 10000))
+# Verified tokens are remembered until they expire, but never longer than this
+TOKEN_CACHE_MAX_SECONDS = int(os.environ.get("TOKEN_CACHE_MAX_SECONDS", 300))
+
+# Algorithms Supabase signs access tokens with; anything else in a token header is rejected
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+
+AuthenticatedUser = namedtuple('AuthenticatedUser', ['id', 'email', 'role', 'claims'])
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class JWKSCache:
+    """The project's public signing keys, fetched once and kept for JWKS_CACHE_SECONDS."""
+
+    def __init__(self, url, max_age=JWKS_CACHE_SECONDS):
+        self.url = url
+        self.max_age = max_age
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        self._keys = {key.get('kid'): key for key in response.json().get('keys', [])}
+        self._fetched_at = time.monotonic()
+
+    def needs_fetch(self, kid):
+        age = None if self._fetched_at is None else time.monotonic() - self._fetched_at
+        # Refetch when the keys are old, or when the token uses a key we haven't seen (rotation)
+        return age is None or age > self.max_age or (kid not in self._keys and age > JWKS_MIN_REFETCH_SECONDS)
+
+    def get_key(self, kid):
+        with self._lock:
+            if self.needs_fetch(kid):
+                self._fetch()
+            return self._keys.get(kid)
+
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens locally instead of calling the auth server on every request.
+    Verified tokens are kept in a bounded LRU cache until they expire, so a repeat request
+    with the same token is a dictionary lookup.
+    """
+
+    def __init__(self, jwt_secret=SUPABASE_JWT_SECRET, jwks_url=JWKS_URL, audience=SUPABASE_JWT_AUDIENCE,
+                 max_entries=TOKEN_CACHE_MAX_ENTRIES, remote_verify=None):
+        self.jwt_secret = jwt_secret
+        self.jwks = JWKSCache(jwks_url) if jwks_url else None
+        self.audience = audience
+        self.max_entries = max_entries
+        # remote_verify(token) -> AuthenticatedUser, used only for HS256 tokens when we don't have the secret
+        self.remote_verify = remote_verify
+        self._cache = OrderedDict()  # token digest -> (AuthenticatedUser, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if time.time() >= expires_at:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return user
+
+    def _cache_set(self, key, user, expires_at):
+        self._cache[key] = (user, expires_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _decode(self, token, header):
+        algorithm = header.get('alg')
+
+        if algorithm == 'HS256':
+            if not self.jwt_secret:
+                return None
+            key = self.jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            if self.jwks is None:
+                raise InvalidToken("No JWKS endpoint configured for asymmetric tokens")
+            key = self.jwks.get_key(header.get('kid'))
+            if key is None:
+                raise InvalidToken("Unknown signing key")
+        else:
+            raise InvalidToken(f"Unsupported token algorithm: {algorithm}")
+
+        try:
+            return jwt.decode(token, key, algorithms=[algorithm], audience=self.audience)
+        except JWTError as e:
+            raise InvalidToken(str(e))
+
+    async def verify(self, token):
+        """Returns the AuthenticatedUser for a valid token, or raises InvalidToken."""
+        with metrics.timer('auth'):
+            return await self._verify(token)
+
+    async def _verify(self, token):
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        user = self._cache_get(key)
+        if user is not None:
+            self.hits += 1
+            metrics.cache('token', 1, 0)
+            return user
+        self.misses += 1
+        metrics.cache('token', 0, 1)
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise InvalidToken(str(e))
+        # Only a JWKS (re)fetch does network I/O, so the common case runs inline
+        if header.get('alg') != 'HS256' and self.jwks is not None and self.jwks.needs_fetch(header.get('kid')):
+            claims = await asyncio.to_thread(self._decode, token, header)
+        else:
+            claims = self._decode(token, header)
+
+        if claims is None:
+            if self.remote_verify is None:
+                raise InvalidToken("SUPABASE_JWT_SECRET is not set")
+            user = await asyncio.to_thread(self.remote_verify, token)
+            # The server vouched for the token, so its own `exp` is safe to read unverified.
+            # Without one we can't tell how long it stays valid, so it isn't cached.
+            try:
+                expires_at = jwt.get_unverified_claims(token).get('exp')
+            except JWTError:
+                expires_at = None
+            if expires_at is None:
+                return user
+        else:
+            if not claims.get('sub'):
+                raise InvalidToken("Token has no subject")
+            user = AuthenticatedUser(claims['sub'], claims.get('email'), claims.get('role'), claims)
+            expires_at = claims.get('exp', time.time())
+
+        self._cache_set(key, user, min(expires_at, time.time() + TOKEN_CACHE_MAX_SECONDS))
+        return user
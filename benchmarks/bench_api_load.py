@@ -0,0 +1,122 @@
+# benchmarks/bench_api_load.py
+#
+# Load test of the feed data access: the old handler shape (two blocking supabase calls
+# inside an async endpoint) vs. SupabaseRepository (thread-pool offload, both queries in
+# parallel). The backend is a local stand-in for PostgREST that answers after 20 ms, and the
+# requests go through a real supabase client and a FastAPI app, driven in-process by httpx.
+# The backend runs in its own process so it doesn't compete with the API for the GIL.
+# Run from the repository root:  python benchmarks/bench_api_load.py
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from fastapi import FastAPI
+from supabase import create_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent4_personalizer import PersonalizationAgent
+from repository import SupabaseRepository
+
+BACKEND_LATENCY = 0.02
+REQUESTS_PER_USER = 5
+CONCURRENT_USERS = (100, 200)
+
+ARTICLES = [
+    {'url': f'https://example.com/{i}', 'headline': f'Article {i}', 'category': ['Technology', 'Business'][i % 2],
+     'entities': {'ORG': [f'Org {i % 17}']}, 'created_at': f'2026-01-01T00:{i // 60:02d}:{i % 60:02d}'}
+    for i in range(200)
+]
+PROFILE = {'interest_profile': {'categories': {'Technology': 2.0}, 'entities': {'Org 3': 1.0}}}
+
+
+class StandInPostgREST(BaseHTTPRequestHandler):
+    """Answers the two queries /feed makes, after BACKEND_LATENCY seconds."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(BACKEND_LATENCY)
+        if self.path.startswith('/rest/v1/user_profiles'):
+            body = json.dumps(PROFILE).encode()
+        else:
+            body = json.dumps(ARTICLES).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_backend(port_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInPostgREST)
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def build_app(client):
+    app = FastAPI()
+    agent = PersonalizationAgent()
+    repository = SupabaseRepository(client, max_workers=64)
+
+    @app.get("/feed/blocking")
+    async def blocking_feed():
+        # What /feed did before: synchronous client calls straight from the event loop
+        profile = client.table('user_profiles').select("interest_profile").eq('id', 'u').single().execute().data
+        articles = client.table('articles').select("*").order('created_at', desc=True).limit(200).execute().data
+        interest_profile = profile['interest_profile']
+        return {"feed": agent.rank_articles_for_user(interest_profile, articles, top_k=50)}
+
+    @app.get("/feed/async")
+    async def async_feed():
+        profile, articles = await asyncio.gather(
+            repository.get_user_profile('u'), repository.get_recent_articles(None, 200)
+        )
+        return {"feed": agent.rank_articles_for_user(profile, articles, top_k=50)}
+
+    return app
+
+
+async def run_load(app, path, users):
+    latencies = []
+
+    async def user(http):
+        for _ in range(REQUESTS_PER_USER):
+            start = time.perf_counter()
+            response = await http.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(user(http) for _ in range(users)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+if __name__ == "__main__":
+    port_queue = multiprocessing.Queue()
+    backend = multiprocessing.Process(target=serve_backend, args=(port_queue,), daemon=True)
+    backend.start()
+    client = create_client(f"http://127.0.0.1:{port_queue.get()}", "bench-key")
+    app = build_app(client)
+
+    print(f"Stand-in backend latency: {BACKEND_LATENCY * 1000:.0f} ms per query, 2 queries per request")
+    for users in CONCURRENT_USERS:
+        for label, path in (("blocking", "/feed/blocking"), ("repository", "/feed/async")):
+            throughput, p50, p99 = asyncio.run(run_load(app, path, users))
+            print(f"{users:4d} users  {label:10s}  {throughput:7.1f} req/s  p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms")
+    backend.terminate()
@@ -0,0 +1,80 @@
+# benchmarks/bench_categorizer.py
+#
+# Throughput of the compiled KeywordCategorizer against the original per-keyword
+# substring scan, on the built-in 26-term table and on tables with thousands of terms.
+# Run from the repository root:  python benchmarks/bench_categorizer.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from categorizer import KeywordCategorizer, DEFAULT_CATEGORY_KEYWORDS
+
+random.seed(42)
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+TEXTS = 200
+WORDS_PER_TEXT = 800
+
+
+def random_word():
+    return ''.join(random.choice(ALPHABET) for _ in range(random.randint(3, 9)))
+
+
+def make_table(categories, terms_per_category):
+    table = {}
+    for c in range(categories):
+        terms = []
+        for _ in range(terms_per_category):
+            # Roughly one in five keywords is a two or three word phrase
+            n = 1 if random.random() < 0.8 else random.randint(2, 3)
+            terms.append(' '.join(random_word() for _ in range(n)))
+        table[f'Category{c}'] = terms
+    return table
+
+
+def make_texts(table):
+    vocabulary = [random_word() for _ in range(5000)]
+    keywords = [k for terms in table.values() for k in terms]
+    texts = []
+    for _ in range(TEXTS):
+        words = [random.choice(vocabulary) for _ in range(WORDS_PER_TEXT)]
+        for _ in range(20):
+            words[random.randrange(len(words))] = random.choice(keywords)
+        texts.append(' '.join(words))
+    return texts
+
+
+def legacy_categorize(table, text):
+    """The original categorize_article loop: one substring check per keyword."""
+    category_scores = {cat: 0 for cat in table}
+    for category, keywords in table.items():
+        for keyword in keywords:
+            if keyword in text:
+                category_scores[category] += 1
+    top_category = max(category_scores, key=category_scores.get)
+    return top_category if category_scores[top_category] > 0 else 'General'
+
+
+def throughput(func, texts):
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return len(texts) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"{'terms':>7}{'build ms':>10}{'legacy texts/s':>16}{'compiled texts/s':>18}")
+    tables = [DEFAULT_CATEGORY_KEYWORDS] + [make_table(c, n) for c, n in [(4, 7), (10, 100), (20, 250), (50, 200)]]
+    for table in tables:
+        texts = make_texts(table)
+
+        start = time.perf_counter()
+        categorizer = KeywordCategorizer(table)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        legacy = throughput(lambda t: legacy_categorize(table, t), texts)
+        compiled = throughput(categorizer.categorize, texts)
+        terms = sum(len(keywords) for keywords in table.values())
+        print(f"{terms:>7}{build_ms:>10.1f}{legacy:>16.0f}{compiled:>18.0f}")
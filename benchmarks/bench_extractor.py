@@ -0,0 +1,57 @@
+# benchmarks/bench_extractor.py
+#
+# Compares the single-pass lxml extractor with the original BeautifulSoup div scan
+# on the saved HTML pages in benchmarks/fixtures/html.
+# Run from the repository root:  python benchmarks/bench_extractor.py
+
+import glob
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from content_extractor import extract_main_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'html')
+ROUNDS = 20
+
+
+def legacy_extract(html):
+    """The original fetch_full_article_text logic, kept here as the reference implementation."""
+    soup = BeautifulSoup(html, 'lxml')
+    potential_containers = soup.find_all('div')
+    main_content_container = None
+    max_p_tags = 0
+
+    for container in potential_containers:
+        p_tags_count = len(container.find_all('p', recursive=False))
+        if p_tags_count > max_p_tags:
+            max_p_tags = p_tags_count
+            main_content_container = container
+
+    if main_content_container:
+        paragraphs = main_content_container.find_all('p')
+        return '\n'.join([p.get_text(strip=True) for p in paragraphs])
+    return None
+
+
+def time_it(func, html):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(html)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'fixture':<24}{'size KB':>9}{'bs4 ms':>10}{'lxml ms':>10}{'speedup':>9}  same output")
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            html = f.read()
+
+        same = legacy_extract(html) == extract_main_text(html)
+        legacy_ms = time_it(legacy_extract, html)
+        new_ms = time_it(extract_main_text, html)
+        name = os.path.basename(path)
+        print(f"{name:<24}{len(html) / 1024:>9.1f}{legacy_ms:>10.2f}{new_ms:>10.2f}{legacy_ms / new_ms:>8.1f}x  {same}")
@@ -0,0 +1,31 @@
+# benchmarks/bench_import.py
+#
+# Measures cold-start cost of the cleaner module in fresh interpreters:
+#   - "import only": what every cold start pays now that the model loads lazily
+#   - "import + model": what every cold start used to pay when the model loaded at import
+# Run from the repository root:  python benchmarks/bench_import.py [rounds]
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = {
+    'import only': "import agent2_cleaner",
+    'import + model': "import agent2_cleaner; agent2_cleaner.get_tagger(); agent2_cleaner.get_stop_words()",
+}
+
+
+def time_snippet(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for label, code in SNIPPETS.items():
+        timings = sorted(time_snippet(code) for _ in range(rounds))
+        print(f"{label:<16} best {timings[0]:.2f}s  median {timings[len(timings) // 2]:.2f}s")
@@ -0,0 +1,54 @@
+# benchmarks/bench_summarizer.py
+#
+# Sequential summarize_article calls vs. the concurrent summarize_articles API,
+# and packed requests of 5 articles each, all against the local stub model
+# (200 ms per call, 5% rate-limit errors).
+# Run from the repository root:  python benchmarks/bench_summarizer.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent3_summarizer
+from agent3_summarizer import RateLimiter, SummarizerAgent
+from stub_llm import StubModel
+
+ARTICLES = 40
+
+
+def make_articles():
+    return [{'clean_content': f'article {i} ' + 'lorem ipsum dolor sit amet ' * 100} for i in range(ARTICLES)]
+
+
+if __name__ == "__main__":
+    # Short backoff so the benchmark measures concurrency, not retry sleeps
+    agent3_summarizer.SUMMARIZER_BACKOFF_SECONDS = 0.05
+
+    agent = SummarizerAgent(model=StubModel(latency=0.2), use_cache=False)
+    articles = make_articles()
+    start = time.perf_counter()
+    for article in articles:
+        agent.summarize_article(article)
+    sequential = time.perf_counter() - start
+
+    model = StubModel(latency=0.2, error_rate=0.05)
+    agent = SummarizerAgent(model=model, use_cache=False)
+    articles = make_articles()
+    start = time.perf_counter()
+    agent.summarize_articles(articles, concurrency=8, limiter=RateLimiter(requests_per_minute=600))
+    concurrent = time.perf_counter() - start
+    concurrent_calls = model.calls
+    failed = sum(a['summary'].startswith('Error') for a in articles)
+
+    model = StubModel(latency=0.2, error_rate=0.05)
+    agent = SummarizerAgent(model=model, use_cache=False)
+    articles = make_articles()
+    start = time.perf_counter()
+    agent.summarize_articles(articles, concurrency=8, limiter=RateLimiter(requests_per_minute=600), pack_size=5)
+    packed = time.perf_counter() - start
+    packed_failed = sum(a['summary'].startswith('Error') for a in articles)
+
+    print(f"sequential: {sequential:.2f}s for {ARTICLES} articles")
+    print(f"concurrent: {concurrent:.2f}s for {ARTICLES} articles ({concurrent_calls} calls incl. retries, {failed} failed)")
+    print(f"packed x5:  {packed:.2f}s for {ARTICLES} articles ({model.calls} calls incl. retries, {packed_failed} failed)")
@@ -0,0 +1,325 @@
+# benchmarks/run_benchmarks.py
+#
+# Offline benchmark suite: throughput and p50/p99 latency of every stage, against recorded
+# fixtures and the stub backends (stub_backends.py, stub_llm.py). Nothing leaves the machine.
+#
+# Run from the repository root:
+#   python benchmarks/run_benchmarks.py                      # 10k articles, 100k users
+#   python benchmarks/run_benchmarks.py --quick              # small sizes, for a smoke test
+#   python benchmarks/run_benchmarks.py --only ranking feed
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --baseline results.json   # flags regressions, exits 1
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+# Caches and indexes go to a scratch directory, so runs don't warm each other up
+_scratch = tempfile.mkdtemp(prefix="ai-agent-bench-")
+os.environ.setdefault("HTTP_CACHE_DIR", _scratch)
+os.environ.setdefault("RESULT_CACHE_DIR", _scratch)
+os.environ.setdefault("SEEN_URL_INDEX_PATH", os.path.join(_scratch, "seen_urls.sqlite3"))
+os.environ.setdefault("METRICS_REPORT_DIR", os.path.join(_scratch, "reports"))
+
+from stub_backends import (
+    FixtureSession, InMemorySupabase, install_stub_ner, fixture_texts, make_articles, make_profiles
+)
+from stub_llm import StubModel
+
+BENCHMARK_NAMES = ('harvester', 'cleaner', 'summarizer', 'ranking', 'feed')
+# A benchmark regresses when its p99 grows, or its throughput drops, by more than this
+DEFAULT_TOLERANCE = 0.25
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def result(items, elapsed, latencies, unit='items', **extra):
+    """One benchmark's numbers: throughput over the whole run, and per-call latency."""
+    latencies = sorted(latencies)
+    return {
+        'items': items,
+        'seconds': round(elapsed, 4),
+        'throughput': round(items / elapsed, 2) if elapsed else None,
+        'unit': f"{unit}/s",
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 4) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4) if latencies else None,
+        **extra,
+    }
+
+
+def timed_calls(function, items):
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        call_start = time.perf_counter()
+        function(item)
+        latencies.append(time.perf_counter() - call_start)
+    return time.perf_counter() - start, latencies
+
+
+# --- BENCHMARKS ---
+
+def bench_harvester(args):
+    """run_harvester end to end: NewsAPI + listing page + every article page, fetched concurrently."""
+    import harvester
+
+    harvester._session = FixtureSession(latency=args.fetch_latency)
+    latencies = []
+    fetch_article = harvester.fetch_article
+
+    def timed_fetch(url):
+        start = time.perf_counter()
+        try:
+            return fetch_article(url)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    harvester.fetch_article = timed_fetch
+    try:
+        start = time.perf_counter()
+        articles = harvester.run_harvester()
+        elapsed = time.perf_counter() - start
+    finally:
+        harvester.fetch_article = fetch_article
+    return {'run_harvester': result(len(latencies), elapsed, latencies, unit='pages', extracted=len(articles))}
+
+
+def bench_cleaner(args, stub_ner):
+    """process_article one at a time, and process_articles over the same texts as one batch."""
+    from agent2_cleaner import CleanerTaggerAgent
+
+    texts = fixture_texts()
+    count = args.cleaner_articles
+    # Vary the texts a little so no two articles are identical
+    articles = [{'content': f"Story {i}. " + texts[i % len(texts)]} for i in range(count)]
+
+    agent = CleanerTaggerAgent(use_cache=False)
+    agent.process_article(dict(articles[0]))  # load the model outside the measurement
+    elapsed, latencies = timed_calls(lambda a: agent.process_article(dict(a)), articles)
+    single = result(count, elapsed, latencies, unit='articles', stub_ner=stub_ner)
+
+    batch_articles = [dict(a) for a in articles]
+    start = time.perf_counter()
+    agent.process_articles(batch_articles)
+    elapsed = time.perf_counter() - start
+    batch = result(count, elapsed, [elapsed / count] * count, unit='articles', stub_ner=stub_ner)
+    return {'process_article': single, 'process_articles': batch}
+
+
+def bench_summarizer(args):
+    """Single summarize_article calls, then the concurrent summarize_articles path."""
+    import agent3_summarizer
+    from agent3_summarizer import SummarizerAgent, RateLimiter
+
+    texts = fixture_texts()
+    model = StubModel(latency=args.llm_latency)
+    agent = SummarizerAgent(model=model, use_cache=False)
+
+    singles = [{'clean_content': f"Story {i}. " + texts[i % len(texts)]} for i in range(args.summarizer_articles // 4)]
+    elapsed, latencies = timed_calls(agent.summarize_article, singles)
+    single = result(len(singles), elapsed, latencies, unit='articles')
+
+    # Per-request latency on the concurrent path, measured around the model call
+    request_latencies = []
+    generate = model.generate_content_async
+
+    async def timed_generate(prompt):
+        start = time.perf_counter()
+        try:
+            return await generate(prompt)
+        finally:
+            request_latencies.append(time.perf_counter() - start)
+
+    model.generate_content_async = timed_generate
+    batch_articles = [{'clean_content': f"Story {i}. " + texts[i % len(texts)]} for i in range(args.summarizer_articles)]
+    # The stub has no quota, so the limiter is set high enough to measure the code, not the limit
+    limiter = RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+    start = time.perf_counter()
+    agent.summarize_articles(batch_articles, limiter=limiter, concurrency=agent3_summarizer.SUMMARIZER_CONCURRENCY)
+    elapsed = time.perf_counter() - start
+    batch = result(len(batch_articles), elapsed, request_latencies, unit='articles')
+    return {'summarize_article': single, 'summarize_articles': batch}
+
+
+def bench_ranking(args, articles, profiles):
+    """rank_articles_for_user per user over the candidate index, and batch scoring of every user."""
+    from agent4_personalizer import PersonalizationAgent, ArticleIndex
+
+    agent = PersonalizationAgent()
+    start = time.perf_counter()
+    index = ArticleIndex(articles)
+    build_seconds = time.perf_counter() - start
+
+    sample = random.Random(3).sample(profiles, min(args.rank_sample, len(profiles)))
+    user_profiles = [p['interest_profile'] for p in sample]
+    elapsed, latencies = timed_calls(lambda p: agent.rank_articles_for_user(p, index, top_k=50), user_profiles)
+    per_user = result(len(user_profiles), elapsed, latencies, unit='users',
+                      articles=len(articles), index_build_seconds=round(build_seconds, 4))
+    results = {'rank_articles_for_user': per_user}
+
+    try:
+        from batch_scoring import score_feeds, ArticleMatrix
+    except ImportError as e:
+        print(f"Skipping batch scoring ({e}).")
+        return results
+    start = time.perf_counter()
+    matrix = ArticleMatrix(articles)
+    all_profiles = {p['id']: p['interest_profile'] for p in profiles}
+    score_feeds(all_profiles, matrix, k=50)
+    elapsed = time.perf_counter() - start
+    results['score_feeds'] = result(len(all_profiles), elapsed, [], unit='users', articles=len(articles))
+    return results
+
+
+def bench_feed(args, articles, profiles):
+    """GET /feed through the whole app (auth, repository, feed cache, ranking, projection, gzip)."""
+    import httpx
+    import supabase as supabase_module
+    from jose import jwt
+
+    database = InMemorySupabase(latency=args.db_latency)
+    database.load('articles', articles).load('user_profiles', profiles)
+    os.environ.setdefault("SUPABASE_URL", "http://stub.local")
+    os.environ.setdefault("SUPABASE_KEY", "stub-key")
+    os.environ["SUPABASE_JWT_SECRET"] = "benchmark-secret"
+    os.environ["FEED_CANDIDATES"] = str(len(articles))
+    # api.py builds its client at import time, so the stand-in has to be in place first
+    supabase_module.create_client = lambda url, key: database
+    import api
+
+    rng = random.Random(4)
+    users = rng.sample([p['id'] for p in profiles], min(args.feed_users, len(profiles)))
+    expires = int(time.time()) + 3600
+    tokens = {
+        user_id: jwt.encode({'sub': user_id, 'aud': 'authenticated', 'exp': expires}, "benchmark-secret")
+        for user_id in users
+    }
+
+    async def run_phase(user_ids):
+        latencies = []
+        queue = list(user_ids)
+
+        async def client_loop(http):
+            while queue:
+                user_id = queue.pop()
+                start = time.perf_counter()
+                response = await http.get('/feed', headers={
+                    'Authorization': f"Bearer {tokens[user_id]}", 'Accept-Encoding': 'gzip',
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop(http) for _ in range(args.concurrency)))
+            return time.perf_counter() - start, latencies
+
+    # Cold: every request is a new user (token verification, profile read, full ranking).
+    # Warm: the same users again, served from the token and feed caches.
+    elapsed, latencies = asyncio.run(run_phase(users))
+    cold = result(len(users), elapsed, latencies, unit='requests', concurrency=args.concurrency)
+    elapsed, latencies = asyncio.run(run_phase(users))
+    warm = result(len(users), elapsed, latencies, unit='requests', concurrency=args.concurrency)
+    return {'feed_cold': cold, 'feed_warm': warm}
+
+
+# --- REPORTING ---
+
+def compare(results, baseline, tolerance):
+    """Returns a line for every benchmark that got slower than the baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous.get('p99_ms') and current.get('p99_ms') and current['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {previous['p99_ms']:.3f} -> {current['p99_ms']:.3f} ms")
+        if previous.get('throughput') and current.get('throughput') and current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput']:.1f} -> {current['throughput']:.1f} {current['unit']}")
+    return regressions
+
+
+def print_table(results):
+    print(f"\n{'benchmark':26s} {'items':>8s} {'throughput':>18s} {'p50 ms':>10s} {'p99 ms':>10s}")
+    for name, r in results.items():
+        p50 = f"{r['p50_ms']:.3f}" if r['p50_ms'] is not None else '-'
+        p99 = f"{r['p99_ms']:.3f}" if r['p99_ms'] is not None else '-'
+        print(f"{name:26s} {r['items']:8d} {r['throughput']:>11.1f} {r['unit']:>6s} {p50:>10s} {p99:>10s}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--only', nargs='+', choices=BENCHMARK_NAMES, default=list(BENCHMARK_NAMES))
+    parser.add_argument('--quick', action='store_true', help="small sizes, for a smoke test")
+    parser.add_argument('--articles', type=int, default=10000, help="stored articles to rank")
+    parser.add_argument('--users', type=int, default=100000, help="users in the user_profiles table")
+    parser.add_argument('--rank-sample', type=int, default=2000, help="users timed one by one")
+    parser.add_argument('--feed-users', type=int, default=2000, help="users requesting /feed")
+    parser.add_argument('--concurrency', type=int, default=64, help="concurrent /feed clients")
+    parser.add_argument('--cleaner-articles', type=int, default=200)
+    parser.add_argument('--summarizer-articles', type=int, default=200)
+    parser.add_argument('--fetch-latency', type=float, default=0.02, help="seconds per stub HTTP request")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="seconds per stub LLM call")
+    parser.add_argument('--db-latency', type=float, default=0.0, help="seconds per stub database query")
+    parser.add_argument('--output', help="write the results as JSON")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    if args.quick:
+        args.articles, args.users, args.rank_sample, args.feed_users = 1000, 5000, 200, 200
+        args.cleaner_articles, args.summarizer_articles = 40, 40
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stub_ner = install_stub_ner()
+    if stub_ner and 'cleaner' in args.only:
+        print("Flair is not installed: NER runs on the stub tagger, so cleaner numbers exclude the model.")
+
+    results = {}
+    if 'harvester' in args.only:
+        results.update(bench_harvester(args))
+    if 'cleaner' in args.only:
+        results.update(bench_cleaner(args, stub_ner))
+    if 'summarizer' in args.only:
+        results.update(bench_summarizer(args))
+    if 'ranking' in args.only or 'feed' in args.only:
+        start = time.perf_counter()
+        articles = make_articles(args.articles)
+        profiles = make_profiles(args.users)
+        print(f"Generated {len(articles)} articles and {len(profiles)} user profiles "
+              f"in {time.perf_counter() - start:.1f}s.")
+        if 'ranking' in args.only:
+            results.update(bench_ranking(args, articles, profiles))
+        if 'feed' in args.only:
+            results.update(bench_feed(args, articles, profiles))
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
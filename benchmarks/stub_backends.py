@@ -0,0 +1,381 @@
+# benchmarks/stub_backends.py
+#
+# Offline stand-ins for everything the pipeline and the API talk to, so every stage can be
+# benchmarked without NewsAPI, live sites, Gemini or Supabase:
+#   - FixtureSession answers the harvester's requests from benchmarks/fixtures;
+#   - InMemorySupabase holds the `articles` and `user_profiles` tables;
+#   - install_stub_ner() stands in for Flair when it isn't installed;
+#   - make_articles / make_profiles build synthetic datasets of any size.
+# The stub LLM lives in stub_llm.py.
+
+import copy
+import glob
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ARTICLE_FIXTURES = ('large_article', 'nested_tie', 'unicode_entities')
+# Every Nth article page answers 404, so failure handling is part of the measurement
+NOT_FOUND_EVERY = 25
+
+
+def _response(url, status_code, body, content_type):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response._content = body
+    response.encoding = 'utf-8'
+    response.headers = CaseInsensitiveDict({'Content-Type': content_type})
+    return response
+
+
+class FixtureSession:
+    """
+    Looks like the harvester's requests.Session: NewsAPI gets the recorded top-headlines JSON,
+    the scraped listing page and every article page come from the saved HTML fixtures.
+    `latency` seconds are added to each request, like a network round trip.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        with open(os.path.join(FIXTURES_DIR, 'newsapi_top_headlines.json'), 'rb') as f:
+            self.newsapi = f.read()
+        with open(os.path.join(FIXTURES_DIR, 'thehindu_technology.html'), 'rb') as f:
+            self.listing = f.read()
+        self.pages = []
+        for name in ARTICLE_FIXTURES:
+            with open(os.path.join(FIXTURES_DIR, 'html', f'{name}.html'), 'rb') as f:
+                self.pages.append(f.read())
+
+    def get(self, url, params=None, headers=None, timeout=None, **kwargs):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if 'newsapi.org' in url:
+            return _response(url, 200, self.newsapi, 'application/json')
+        if url.rstrip('/').endswith('/sci-tech/technology'):
+            return _response(url, 200, self.listing, 'text/html')
+        digest = int(hashlib.md5(url.encode('utf-8')).hexdigest(), 16)
+        if digest % NOT_FOUND_EVERY == 0:
+            return _response(url, 404, b'<html><body>Not found</body></html>', 'text/html')
+        return _response(url, 200, self.pages[digest % len(self.pages)], 'text/html')
+
+
+def fixture_texts():
+    """The article text of every saved HTML page, for benchmarks that start after harvesting."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from content_extractor import extract_main_text
+
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'html', '*.html'))):
+        with open(path, 'rb') as f:
+            text = extract_main_text(f.read())
+        if text:
+            texts.append(text)
+    return texts
+
+
+# --- IN-MEMORY SUPABASE ---
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class InMemoryTable:
+    """Rows keyed by their primary key column, so eq() lookups on it are a dictionary get."""
+
+    def __init__(self, key):
+        self.key = key
+        self.rows = {}
+        self.lock = threading.Lock()
+
+
+class _Query:
+    """The subset of the postgrest query builder the app uses."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = None
+        self.filters = []
+        self.ordering = None
+        self.row_limit = None
+        self.single_row = False
+        self.write = None
+
+    def select(self, columns='*', **kwargs):
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, lambda v: v == value, value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append((column, lambda v: v is not None and v > value, None))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append((column, lambda v: v is not None and v >= value, None))
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append((column, lambda v: v in values, None))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def upsert(self, rows, on_conflict=None, **kwargs):
+        self.write = ('upsert', rows if isinstance(rows, list) else [rows])
+        return self
+
+    def insert(self, rows, **kwargs):
+        return self.upsert(rows)
+
+    def update(self, values):
+        self.write = ('update', values)
+        return self
+
+    def _project(self, row):
+        # Like JSON off the wire: callers can't change the stored rows through what they read
+        return copy.deepcopy(row if self.columns is None else {c: row.get(c) for c in self.columns})
+
+    def _matching(self, table):
+        # A primary key lookup doesn't need a scan
+        for column, _, value in self.filters:
+            if column == table.key and value is not None:
+                row = table.rows.get(value)
+                rows = [row] if row is not None else []
+                break
+        else:
+            rows = list(table.rows.values())
+        for column, matches, _ in self.filters:
+            rows = [row for row in rows if matches(row.get(column))]
+        return rows
+
+    def execute(self):
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        table = self.client.tables[self.table]
+        with table.lock:
+            if self.write is not None:
+                kind, payload = self.write
+                if kind == 'upsert':
+                    # Like the articles.updated_at trigger: every write stamps the row
+                    stamp = datetime.now(timezone.utc).isoformat()
+                    for row in payload:
+                        table.rows[row[table.key]] = {**table.rows.get(row[table.key], {}), **row, 'updated_at': stamp}
+                    return _Result(payload)
+                updated = []
+                for row in self._matching(table):
+                    row.update(payload)
+                    updated.append(dict(row))
+                return _Result(updated)
+
+            rows = self._matching(table)
+            if self.ordering:
+                column, desc = self.ordering
+                rows.sort(key=lambda row: row.get(column) or '', reverse=desc)
+            if self.row_limit is not None:
+                rows = rows[:self.row_limit]
+            data = [self._project(row) for row in rows]
+        if self.single_row:
+            if len(data) != 1:
+                raise ValueError(f"Expected exactly one row, got {len(data)}")
+            return _Result(data[0])
+        return _Result(data)
+
+
+class _Call:
+    def __init__(self, client, function, params):
+        self.client = client
+        self.function = function
+        self.params = params
+
+    def execute(self):
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        return _Result(self.function(**self.params))
+
+
+class InMemorySupabase:
+    """A stand-in for the supabase client holding the `articles` and `user_profiles` tables."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {'articles': InMemoryTable('url'), 'user_profiles': InMemoryTable('id')}
+        self.functions = {'save_interest_profiles': self._save_interest_profiles}
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        return _Call(self, self.functions[name], params or {})
+
+    def _save_interest_profiles(self, updates):
+        """Same semantics as supabase/migrations/*_save_interest_profiles.sql."""
+        table = self.tables['user_profiles']
+        conflicts = []
+        with table.lock:
+            for update in updates:
+                row = table.rows.get(update['id'])
+                expected = update.get('expected_version')
+                if expected is None:
+                    written = row is None
+                else:
+                    written = row is not None and (row.get('interest_profile') or {}).get('version', 0) == expected
+                if written:
+                    table.rows[update['id']] = {**(row or {}), 'id': update['id'], 'interest_profile': update['profile']}
+                else:
+                    conflicts.append({'conflicted_id': update['id']})
+        return conflicts
+
+    def load(self, name, rows):
+        table = self.tables[name]
+        for row in rows:
+            table.rows[row[table.key]] = row
+        return self
+
+
+# --- STUB NER ---
+
+_CAPITALIZED_RUN_RE = re.compile(r"\b[A-Z][\w&.'-]*(?:\s+[A-Z][\w&.'-]*)*")
+
+
+class StubSpan:
+    def __init__(self, text, tag):
+        self.text = text
+        self.tag = tag
+
+
+class StubSentence:
+    def __init__(self, text):
+        self.text = text
+        self.spans = []
+
+    def get_spans(self, label_type):
+        return self.spans
+
+
+class StubTagger:
+    """Tags runs of capitalized words: all-caps runs as ORG, two-word runs as PER, the rest as LOC."""
+
+    @classmethod
+    def load(cls, name):
+        return cls()
+
+    def predict(self, sentences, mini_batch_size=32):
+        if not isinstance(sentences, list):
+            sentences = [sentences]
+        for sentence in sentences:
+            spans = []
+            for match in _CAPITALIZED_RUN_RE.finditer(sentence.text):
+                text = match.group(0)
+                if text.isupper():
+                    spans.append(StubSpan(text, 'ORG'))
+                elif len(text.split()) == 2:
+                    spans.append(StubSpan(text, 'PER'))
+                else:
+                    spans.append(StubSpan(text, 'LOC'))
+            sentence.spans = spans
+
+
+class StubSplitter:
+    def split(self, text):
+        return [StubSentence(part) for part in re.split(r'(?<=[.!?])\s+', text) if part.strip()]
+
+
+def install_stub_ner():
+    """
+    Makes `flair` importable with the stub tagger when the real one isn't installed.
+    Returns True if the stub is in use; NER timings then measure the plumbing, not the model.
+    """
+    try:
+        import flair  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    flair = types.ModuleType('flair')
+    data = types.ModuleType('flair.data')
+    data.Sentence = StubSentence
+    models = types.ModuleType('flair.models')
+    models.SequenceTagger = StubTagger
+    splitter = types.ModuleType('flair.splitter')
+    splitter.SegtokSentenceSplitter = StubSplitter
+    sys.modules.update({'flair': flair, 'flair.data': data, 'flair.models': models, 'flair.splitter': splitter})
+    return True
+
+
+# --- SYNTHETIC DATASETS ---
+
+CATEGORIES = ['Technology', 'Business', 'Sports', 'Health', 'Politics', 'General']
+ENTITY_POOL_SIZE = 5000
+
+
+def make_articles(count, seed=0):
+    """`count` stored articles, newest first, shaped like rows of the `articles` table."""
+    rng = random.Random(seed)
+    entity_names = [f"Entity {i}" for i in range(ENTITY_POOL_SIZE)]
+    newest = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    articles = []
+    for i in range(count):
+        articles.append({
+            'url': f"https://news.example.com/story-{i}",
+            'headline': f"Story {i} about {rng.choice(CATEGORIES).lower()}",
+            'summary': "A two-sentence summary of the story. " * 2,
+            'category': rng.choice(CATEGORIES),
+            'entities': {
+                'ORG': rng.sample(entity_names, 3),
+                'PERSON': rng.sample(entity_names, 2),
+                'GPE': rng.sample(entity_names, 1),
+            },
+            'content': "Full article text. " * 200,
+            'cluster_id': f"{i:016x}",
+            'created_at': (newest - timedelta(minutes=i)).isoformat(),
+            'updated_at': (newest - timedelta(minutes=i)).isoformat(),
+        })
+    return articles
+
+
+def make_profiles(count, seed=1, entities_per_user=20):
+    """`count` rows of the `user_profiles` table with random interests."""
+    rng = random.Random(seed)
+    entity_names = [f"Entity {i}" for i in range(ENTITY_POOL_SIZE)]
+    return [
+        {
+            'id': f"user-{i}",
+            'interest_profile': {
+                'categories': {c: round(rng.uniform(0.5, 5), 2) for c in rng.sample(CATEGORIES, 2)},
+                'entities': {
+                    name: round(rng.uniform(0.5, 3), 2) for name in rng.sample(entity_names, entities_per_user)
+                },
+            },
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,63 @@
+# benchmarks/stub_llm.py
+#
+# A local stand-in for the Gemini model, so the summarizer can be exercised and
+# benchmarked without network access or API quota.
+
+import asyncio
+import json
+import random
+import re
+import time
+
+PACKED_ARTICLE_RE = re.compile(r'<article id="(\d+)">\s*(.*?)\s*</article>', re.DOTALL)
+
+
+class StubRateLimitError(Exception):
+    """Looks like a 429 from the API (is_retryable_error checks the `code`)."""
+    code = 429
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """
+    Mimics genai.GenerativeModel: fixed latency per call, an optional share of 429
+    errors, and a canned summary made from the first words of the article.
+    Packed prompts get a JSON array back; `drop_from_packs` leaves the last article
+    out of every packed reply, to exercise the single-request fallback.
+    """
+
+    def __init__(self, latency=0.2, error_rate=0.0, seed=0, drop_from_packs=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_from_packs = drop_from_packs
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _reply(self, prompt):
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            raise StubRateLimitError("429 Resource has been exhausted")
+        packed = PACKED_ARTICLE_RE.findall(prompt)
+        if packed:
+            if self.drop_from_packs:
+                packed = packed[:-1]
+            items = [{'id': int(i), 'summary': self._summary(text)} for i, text in packed]
+            return StubResponse('```json\n' + json.dumps(items) + '\n```')
+        article = prompt.split('Article: "', 1)[-1].split('"', 1)[0]
+        return StubResponse(self._summary(article))
+
+    @staticmethod
+    def _summary(text):
+        return ' '.join(text.split()[:12]) + '.'
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
@@ -0,0 +1,118 @@
+# categorizer.py
+
+import hashlib
+import json
+import os
+
+# --- CONFIGURATION ---
+# Optional JSON file of {"Category": ["keyword", "multi word keyword", ...]} that replaces
+# the built-in table below. Tables with thousands of terms are fine.
+CATEGORY_KEYWORDS_FILE = os.environ.get("CATEGORY_KEYWORDS_FILE")
+
+# Define keywords for each category
+DEFAULT_CATEGORY_KEYWORDS = {
+    'Technology': ['ai', 'tech', 'apple', 'google', 'microsoft', 'software', 'startup'],
+    'Business': ['stock', 'market', 'ceo', 'company', 'economy', 'finance', 'inc'],
+    'Sports': ['game', 'team', 'player', 'score', 'match', 'league'],
+    'Health': ['health', 'medical', 'doctor', 'hospital', 'disease', 'virus']
+}
+
+# Maps every byte except a-z and 0-9 to a space. Applied to the lowercased UTF-8 text, a plain
+# split() then gives the same words as re.findall('[a-z0-9]+'), several times faster
+# (non-ASCII characters are all bytes >= 128, so they separate words just the same).
+_WORD_BYTES = bytes(b if (97 <= b <= 122 or 48 <= b <= 57) else 32 for b in range(256))
+
+
+def _tokenize(text):
+    """The text's lowercase ASCII words, as bytes."""
+    return text.lower().encode('utf-8').translate(_WORD_BYTES).split()
+
+
+class KeywordCategorizer:
+    """
+    Scores every category in a single pass over the text.
+    Keywords are matched on whole words only (so 'ai' no longer matches inside 'said'),
+    using lookup tables built once: single-word keywords are a set intersection with the
+    text's words, and multi-word keywords are followed word by word from their first word.
+    The cost depends on the text length, not on how many keywords the table has.
+    """
+
+    def __init__(self, categories=None):
+        categories = categories if categories is not None else DEFAULT_CATEGORY_KEYWORDS
+        self.categories = list(categories)
+        self._phrases = {}  # b'keyword phrase' -> indexes of the categories it belongs to
+        self._single_words = set()
+        self._multi_word_starts = set()  # first words of multi-word phrases
+        self._prefixes = set()  # every leading part of a multi-word phrase, to stop scanning early
+        self.max_words = 1
+        for index, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                words = _tokenize(keyword)
+                if not words:
+                    continue
+                phrase = b' '.join(words)
+                owners = self._phrases.setdefault(phrase, [])
+                if index not in owners:
+                    owners.append(index)
+                if len(words) == 1:
+                    self._single_words.add(phrase)
+                else:
+                    self._multi_word_starts.add(words[0])
+                for n in range(1, len(words)):
+                    self._prefixes.add(b' '.join(words[:n]))
+                self.max_words = max(self.max_words, len(words))
+        # Identifies this keyword table, so cached categories can be invalidated when it changes
+        table = json.dumps({c: sorted(k) for c, k in categories.items()}, sort_keys=True)
+        self.fingerprint = hashlib.sha256(table.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_config(cls):
+        """Uses CATEGORY_KEYWORDS_FILE if it is set, otherwise the built-in keyword table."""
+        if CATEGORY_KEYWORDS_FILE:
+            try:
+                return cls.from_file(CATEGORY_KEYWORDS_FILE)
+            except Exception as e:
+                print(f"Could not load category keywords from {CATEGORY_KEYWORDS_FILE}: {e}")
+        return cls()
+
+    def score(self, text):
+        """Returns {category: number of distinct keywords of that category found in the text}."""
+        words = _tokenize(text)
+        # Single-word keywords are a plain set intersection
+        found = self._single_words.intersection(words)
+        # Multi-word keywords are only tried where a word that can start one occurs;
+        # list.index finds those positions without a Python-level loop over every word
+        for first in self._multi_word_starts.intersection(words):
+            start = words.index(first)
+            while True:
+                phrase = first
+                for end in range(start + 1, min(start + self.max_words, len(words))):
+                    phrase = phrase + b' ' + words[end]
+                    if phrase in self._phrases:
+                        found.add(phrase)
+                    if phrase not in self._prefixes:
+                        break
+                try:
+                    start = words.index(first, start + 1)
+                except ValueError:
+                    break
+
+        counts = [0] * len(self.categories)
+        for phrase in found:
+            for index in self._phrases[phrase]:
+                counts[index] += 1
+        return dict(zip(self.categories, counts))
+
+    def categorize(self, text, default='General'):
+        """Returns the best scoring category, or `default` if no keyword was found."""
+        category_scores = self.score(text)
+        if not category_scores:
+            return default
+        # The max function with a key returns the key with the highest value (first one on ties)
+        top_category = max(category_scores, key=category_scores.get)
+        return top_category if category_scores[top_category] > 0 else default
@@ -0,0 +1,112 @@
+# content_extractor.py
+
+import json
+import os
+from urllib.parse import urlparse
+
+import lxml.html
+from lxml import etree
+
+# --- CONFIGURATION ---
+# Optional per-site rules: a JSON file mapping a host name to an XPath that selects the
+# article body, e.g. {"www.example.com": "//div[@itemprop='articleBody']"}.
+# Sites without a rule use the generic "div with the most <p> children" heuristic.
+EXTRACTOR_RULES_FILE = os.environ.get("EXTRACTOR_RULES_FILE")
+
+# Text inside these tags is not part of the readable article
+_NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+
+def load_domain_rules(path=EXTRACTOR_RULES_FILE):
+    """Loads the per-domain XPath rules, returning an empty dict if none are configured."""
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Could not load extractor rules from {path}: {e}")
+        return {}
+
+
+DOMAIN_RULES = load_domain_rules()
+
+
+def _paragraph_text(p):
+    """Same result as BeautifulSoup's `p.get_text(strip=True)`: stripped text pieces glued together."""
+    parts = []
+    for piece in _text_pieces(p):
+        piece = piece.strip()
+        if piece:
+            parts.append(piece)
+    return ''.join(parts)
+
+
+def _text_pieces(element):
+    if element.text and isinstance(element.tag, str) and element.tag not in _NON_TEXT_TAGS:
+        yield element.text
+    for child in element:
+        # Comments and processing instructions have non-string tags; only their tail is text
+        if isinstance(child.tag, str):
+            yield from _text_pieces(child)
+        if child.tail:
+            yield child.tail
+
+
+def _parse(html):
+    if isinstance(html, bytes):
+        # Decode like BeautifulSoup would for the common case, and let lxml sniff the rest
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    try:
+        return lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _find_main_container(root):
+    """
+    One walk over the tree that counts the direct <p> children of every <div>.
+    Ties go to the div that comes first in the document, like the original scan did.
+    """
+    p_counts = {}
+    best, best_count = None, 0
+    for element in root.iter('div', 'p'):
+        if element.tag == 'div':
+            # Divs show up in document order, so registering them here keeps tie-breaking stable
+            p_counts.setdefault(element, 0)
+            continue
+        parent = element.getparent()
+        if parent is not None and parent.tag == 'div':
+            p_counts[parent] += 1
+
+    for container, count in p_counts.items():
+        if count > best_count:
+            best, best_count = container, count
+    return best
+
+
+def extract_main_text(html, url=None, rules=None):
+    """
+    Returns the article text of an HTML page, one paragraph per line, or None if no
+    content container could be found.
+    """
+    root = _parse(html)
+    if root is None:
+        return None
+
+    rules = DOMAIN_RULES if rules is None else rules
+    host = urlparse(url).netloc.lower() if url else ''
+    if host in rules:
+        containers = root.xpath(rules[host])
+        paragraphs = [p for container in containers for p in container.iter('p')]
+        if paragraphs:
+            return '\n'.join(_paragraph_text(p) for p in paragraphs)
+
+    container = _find_main_container(root)
+    if container is None:
+        return None
+    # iterdescendants skips the container itself, just like find_all('p') on it
+    return '\n'.join(_paragraph_text(p) for p in container.iterdescendants('p'))
@@ -0,0 +1,111 @@
+# dedupe.py
+
+import hashlib
+import os
+import random
+
+# --- CONFIGURATION ---
+# Two articles are near-duplicates when about this share of their shingles is the same
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.8))
+# Words per shingle
+SHINGLE_SIZE = 4
+
+# MinHash signature length, split into LSH bands of ROWS_PER_BAND values.
+# With 16 bands of 4 rows, pairs above ~0.5 similarity almost always share a band,
+# and unrelated articles almost never do.
+NUM_PERMUTATIONS = 64
+ROWS_PER_BAND = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed: signatures (and so cluster ids) must be the same from one run to the next
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def _hash64(text):
+    # Python's built-in hash() changes between runs, so we use a real digest
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Returns the set of overlapping `size`-word sequences in the text."""
+    words = text.split()
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text):
+    """MinHash signature of the text's shingles; equal positions estimate their Jaccard similarity."""
+    hashes = [_hash64(shingle) % _MERSENNE_PRIME for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def estimated_similarity(signature_a, signature_b):
+    return sum(1 for x, y in zip(signature_a, signature_b) if x == y) / NUM_PERMUTATIONS
+
+
+def _bands(signature):
+    for start in range(0, NUM_PERMUTATIONS, ROWS_PER_BAND):
+        yield start, signature[start:start + ROWS_PER_BAND]
+
+
+def cluster_near_duplicates(articles, text_key='clean_content'):
+    """
+    Groups near-duplicate articles (syndicated copies, the same story from NewsAPI and a
+    scraped source...) with MinHash signatures and an LSH index over shingles. Only
+    articles that land in the same bucket are compared, instead of every pair.
+
+    Every article gets a `cluster_id`. The first article of each story is its representative,
+    the same as in streaming mode (NearDuplicateIndex), so both modes store the same copy;
+    the others get `duplicate_of` set to the representative's URL.
+    Returns (representatives, duplicates), each in the original order.
+    """
+    index = NearDuplicateIndex(text_key)
+    representatives, duplicates = [], []
+    for article in articles:
+        (representatives if index.add(article) else duplicates).append(article)
+
+    if duplicates:
+        print(f"Near-duplicate detection: {len(duplicates)} of {len(articles)} articles are copies of another story.")
+    return representatives, duplicates
+
+
+class NearDuplicateIndex:
+    """
+    Near-duplicate detection for articles that arrive one at a time.
+    The first article of a story becomes its representative, and later near-copies are
+    matched against the representatives seen so far. Only articles of the same run are
+    compared; nothing is matched against the stored table.
+    """
+
+    def __init__(self, text_key='clean_content'):
+        self.text_key = text_key
+        self._buckets = {}
+        self._representatives = []  # (signature, url, cluster_id)
+
+    def add(self, article):
+        """Sets the article's `cluster_id` (and `duplicate_of`); returns True for a representative."""
+        text = article.get(self.text_key) or ''
+        signature = minhash_signature(text)
+        if signature is not None:
+            for band_key in _bands(signature):
+                for other in self._buckets.get(band_key, []):
+                    other_signature, url, cluster_id = self._representatives[other]
+                    if estimated_similarity(signature, other_signature) >= NEAR_DUPLICATE_THRESHOLD:
+                        article['cluster_id'] = cluster_id
+                        article['duplicate_of'] = url
+                        return False
+
+        article['cluster_id'] = f"{_hash64(text or article.get('url') or ''):016x}"
+        if signature is not None:
+            index = len(self._representatives)
+            self._representatives.append((signature, article.get('url'), article['cluster_id']))
+            for band_key in _bands(signature):
+                self._buckets.setdefault(band_key, []).append(index)
+        return True
@@ -0,0 +1,207 @@
+# feed_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+# --- CONFIGURATION ---
+# How often we poll for newly ingested articles, and how often a cached user's
+# profile is re-read to catch changes made outside this API process
+ARTICLE_REFRESH_SECONDS = float(os.environ.get("FEED_ARTICLE_REFRESH_SECONDS", 30))
+PROFILE_TTL_SECONDS = float(os.environ.get("FEED_PROFILE_TTL_SECONDS", 300))
+FEED_CACHE_MAX_USERS = int(os.environ.get("FEED_CACHE_MAX_USERS", 10000))
+
+
+def profile_fingerprint(user_profile):
+    return hashlib.sha256(json.dumps(user_profile, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ArticleWindow:
+    """
+    The shared set of candidate articles: the newest `max_articles` by created_at, newest first.
+    Refreshes only fetch the articles inserted or updated (updated_at) since the newest change
+    we have; an updated article replaces its old copy by url. Every refresh that changes the
+    window bumps `version`, so cached feeds know what they are missing.
+    """
+
+    def __init__(self, fetch_articles, max_articles, refresh_seconds=ARTICLE_REFRESH_SECONDS):
+        # fetch_articles(since, limit) -> up to `limit` articles with updated_at at or after
+        # `since`, oldest change first (with since=None: the newest `limit` by created_at)
+        self.fetch_articles = fetch_articles
+        self.max_articles = max_articles
+        self.refresh_seconds = refresh_seconds
+        self.articles = []
+        self.version = 0
+        self._batches = []  # [(version, changed articles, urls that left the window)]
+        self._watermark = None
+        self._at_watermark = set()  # urls we already have with updated_at == _watermark
+        self._last_refresh = None
+        self._lock = asyncio.Lock()
+
+    def mark_stale(self):
+        """Forces the next request to look for new articles (e.g. right after an upsert)."""
+        self._last_refresh = None
+
+    def _apply(self, changed):
+        """Merges changed articles in by url; returns the urls that are no longer in the window."""
+        by_url = {article.get('url'): article for article in self.articles}
+        for article in changed:
+            by_url[article.get('url')] = article
+        # sorted() is stable, so articles with the same created_at keep their previous order
+        merged = sorted(by_url.values(), key=lambda article: article.get('created_at') or '', reverse=True)
+        self.articles = merged[:self.max_articles]
+        return {article.get('url') for article in merged[self.max_articles:]}
+
+    async def _fetch_changes(self):
+        """Articles inserted or updated since the watermark that the window doesn't have yet."""
+        known = {article.get('url'): article.get('updated_at') for article in self.articles}
+        known.update((url, self._watermark) for url in self._at_watermark)
+        changed = {}
+        since, limit = self._watermark, self.max_articles
+        while True:
+            page = await self.fetch_articles(since, limit)
+            for article in page:
+                # Rows at exactly the watermark come back again (one upsert shares one updated_at)
+                if known.get(article.get('url')) != article.get('updated_at') or article.get('updated_at') is None:
+                    changed[article.get('url')] = article
+            stamps = [article['updated_at'] for article in page if article.get('updated_at')]
+            newest = max(stamps + ([since] if since else []), default=None)
+            if since is None or len(page) < limit:
+                # Rows at exactly the watermark come back on the next refresh too. Remember them,
+                # even those that didn't make it into the window, so they aren't changes again.
+                if newest != self._watermark:
+                    self._at_watermark = set()
+                self._at_watermark.update(article.get('url') for article in page if article.get('updated_at') == newest)
+                self._watermark = newest
+                return list(changed.values())
+            if newest == since:
+                # A full page that is all one updated_at: ask for a bigger page instead
+                limit *= 2
+            else:
+                since, limit = newest, self.max_articles
+
+    async def refresh_if_due(self):
+        now = time.monotonic()
+        if self._last_refresh is not None and now - self._last_refresh < self.refresh_seconds:
+            return
+        async with self._lock:
+            if self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_seconds:
+                return
+            changed = await self._fetch_changes()
+            self._last_refresh = time.monotonic()
+            if not changed:
+                return
+            self.version += 1
+            removed = self._apply(changed)
+            self._batches.append((self.version, changed, removed))
+            # We only need the increments of versions a cached feed could still be on
+            self._batches = self._batches[-100:]
+
+    def changes_since(self, version):
+        """
+        Returns (changed, removed) since `version`: the articles added or updated that are still
+        in the window, and the urls of articles that were updated or left it. None if that
+        history is gone.
+        """
+        if self._batches and self._batches[0][0] > version + 1:
+            return None
+        touched = set()
+        for batch_version, changed, removed in self._batches:
+            if batch_version > version:
+                touched.update(article.get('url') for article in changed)
+                touched.update(removed)
+        changed = [article for article in self.articles if article.get('url') in touched]
+        return changed, touched
+
+
+class FeedCache:
+    """
+    A per-user cache of ranked feeds.
+    Steady-state requests are one dictionary lookup. When articles are added or updated, only
+    those are scored and merged into the cached ranking. The feed is ranked again from scratch
+    when a ranked article was updated or left the window, and when the user's interest profile
+    changes (invalidate() or a changed profile on re-read).
+    """
+
+    def __init__(self, personalization_agent, fetch_profile, fetch_articles, feed_size, max_candidates):
+        # fetch_profile(user_id) -> {'categories': {...}, 'entities': {...}}
+        self.agent = personalization_agent
+        self.fetch_profile = fetch_profile
+        self.feed_size = feed_size
+        self.window = ArticleWindow(fetch_articles, max_candidates)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, user_id):
+        """Drops a user's cached feed, e.g. after their interest profile was updated."""
+        self._entries.pop(user_id, None)
+
+    def _rank_from_scratch(self, user_profile, fingerprint):
+        with metrics.timer('rank', mode='full'):
+            ranked = self.agent.rank_articles_for_user(user_profile, self.window.articles, top_k=self.feed_size)
+        return {
+            'profile': user_profile,
+            'fingerprint': fingerprint,
+            'profile_checked': time.monotonic(),
+            'version': self.window.version,
+            'ranked': ranked,
+        }
+
+    def _merge_changed_articles(self, entry, changed):
+        """Scores only the changed articles and merges them into the cached ranking."""
+        with metrics.timer('rank', mode='incremental'):
+            new_ranked = self.agent.rank_articles_for_user(entry['profile'], changed, top_k=self.feed_size)
+            # On equal scores the article that comes first in the window goes first,
+            # same as a full re-rank
+            position = {article.get('url'): i for i, article in enumerate(self.window.articles)}
+            merged = sorted(
+                new_ranked + entry['ranked'],
+                key=lambda item: (-item['score'], position.get(item['article'].get('url'), len(position))),
+            )
+        entry['ranked'] = merged[:self.feed_size]
+        entry['version'] = self.window.version
+
+    async def get_feed(self, user_id):
+        """Returns the user's ranked feed as a list of {'article': ..., 'score': ...}."""
+        entry = self._entries.get(user_id)
+        user_profile = None
+
+        if entry is None or time.monotonic() - entry['profile_checked'] > PROFILE_TTL_SECONDS:
+            # The two queries don't depend on each other, so they run at the same time
+            _, user_profile = await asyncio.gather(self.window.refresh_if_due(), self.fetch_profile(user_id))
+        else:
+            await self.window.refresh_if_due()
+
+        if entry is not None and user_profile is not None:
+            if profile_fingerprint(user_profile) == entry['fingerprint']:
+                entry['profile_checked'] = time.monotonic()
+            else:
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            metrics.cache('feed', 0, 1)
+            entry = self._rank_from_scratch(user_profile, profile_fingerprint(user_profile))
+        else:
+            self.hits += 1
+            metrics.cache('feed', 1, 0)
+            if entry['version'] < self.window.version:
+                changes = self.window.changes_since(entry['version'])
+                # An article in the cached ranking that changed or left the window can move down
+                # or out, and whatever should take its place was never scored: rank again
+                if changes is None or any(item['article'].get('url') in changes[1] for item in entry['ranked']):
+                    entry = self._rank_from_scratch(entry['profile'], entry['fingerprint'])
+                else:
+                    self._merge_changed_articles(entry, changes[0])
+
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > FEED_CACHE_MAX_USERS:
+            self._entries.popitem(last=False)
+        return entry['ranked']
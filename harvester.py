@@ -4,7 +4,15 @@ import requests
 import json
 from bs4 import BeautifulSoup
 import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from http_cache import get_http_cache
+from content_extractor import extract_main_text
+from metrics import metrics
 
 load_dotenv()
 # --- CONFIGURATION ---
@@ -19,6 +27,50 @@ params = {
     'apiKey': API_KEY
 }
 
+# --- CONCURRENCY SETTINGS ---
+# How many article pages we download at the same time, in total and per website.
+# Keeping the per-host limit low stops us from hammering a single news site.
+MAX_CONCURRENT_FETCHES = int(os.environ.get("HARVESTER_MAX_WORKERS", 16))
+MAX_FETCHES_PER_HOST = int(os.environ.get("HARVESTER_PER_HOST_LIMIT", 4))
+FETCH_TIMEOUT = 10
+
+# We need headers to mimic a real browser
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the shared HTTP session, so connections are pooled and reused across fetches."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # One connection pool per host, each holding up to MAX_FETCHES_PER_HOST sockets
+            adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_FETCHES, pool_maxsize=MAX_FETCHES_PER_HOST)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def _host_slot(url):
+    """Returns the semaphore that caps how many requests run against the URL's host at once."""
+    host = urlparse(url).netloc.lower()
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(MAX_FETCHES_PER_HOST)
+        return _host_slots[host]
+
+
+def cached_get(url, params=None):
+    """GETs a URL through the shared session and the on-disk conditional-GET cache."""
+    return get_http_cache().get(get_session(), url, params=params, timeout=FETCH_TIMEOUT)
+
 # --- AGENT LOGIC ---
 def fetch_news_from_api():
     """Fetches a list of news articles from the NewsAPI."""
@@ -29,7 +81,7 @@ def fetch_news_from_api():
 
     try:
         # Make the request to the API
-        response = requests.get(NEWS_API_URL, params=params)
+        response = cached_get(NEWS_API_URL, params=params)
 
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
@@ -80,9 +132,8 @@ def scrape_news_from_website():
     articles_found = []
     
     try:
-        # We need headers to mimic a real browser
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(SCRAPE_URL, headers=headers)
+        # The shared session already sends browser-like headers
+        response = cached_get(SCRAPE_URL)
         
         if response.status_code == 200:
             # Parse the page content with BeautifulSoup
@@ -111,70 +162,152 @@ def scrape_news_from_website():
 
 # harvester.py (add this function)
 
-def fetch_full_article_text(url):
+# The outcome of fetching one article page. `ok` is only True when we got real text;
+# otherwise `error` says what went wrong ('http_error', 'no_content' or 'exception')
+# and `detail` carries the exception message, if any.
+FetchResult = namedtuple('FetchResult', ['ok', 'text', 'status_code', 'error', 'detail'], defaults=[None])
+
+
+def fetch_article(url):
     """
-    Visits an article URL and scrapes the full text content.
+    Visits an article URL and scrapes the full text content, returning a FetchResult.
     This is a generic scraper and might need to be customized for specific sites.
     """
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10) # Added a timeout
+        # Wait for a free slot on this host before opening a connection
+        with _host_slot(url):
+            with metrics.timer('fetch'):
+                response = cached_get(url)
+        if getattr(response, 'from_cache', False):
+            metrics.cache('http', 1, 0)
+        else:
+            metrics.cache('http', 0, 1)
 
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            # --- This is the part that needs customization ---
-            # Try to find the main content in common tags like <article>, or divs with
-            # class names like 'content', 'main-content', 'article-body'.
-            # We'll look for a div that contains the most <p> tags.
-            
-            potential_containers = soup.find_all('div')
-            main_content_container = None
-            max_p_tags = 0
-
-            for container in potential_containers:
-                p_tags_count = len(container.find_all('p', recursive=False))
-                if p_tags_count > max_p_tags:
-                    max_p_tags = p_tags_count
-                    main_content_container = container
-            
-            if main_content_container:
-                # Join the text from all <p> tags within the best container
-                paragraphs = main_content_container.find_all('p')
-                full_text = '\n'.join([p.get_text(strip=True) for p in paragraphs])
-                return full_text
-            else:
-                # Fallback if the above logic fails
-                return "Could not extract article text."
-        else:
-            return f"Failed to fetch URL. Status code: {response.status_code}"
+            # Find the <div> with the most direct <p> children and join its paragraphs.
+            # This is done in a single lxml pass, see content_extractor.py.
+            with metrics.timer('parse'):
+                full_text = extract_main_text(response.content, url=url)
+            if full_text is not None:
+                return FetchResult(True, full_text, response.status_code, None)
+            metrics.error('parse')
+            return FetchResult(False, None, response.status_code, 'no_content')
+        metrics.error('fetch')
+        return FetchResult(False, None, response.status_code, 'http_error')
     except Exception as e:
-        return f"An error occurred while fetching article: {e}"
+        return FetchResult(False, None, None, 'exception', str(e))
+
+
+def fetch_full_article_text(url):
+    """Like fetch_article, but returns the text or a human-readable error message."""
+    result = fetch_article(url)
+    if result.ok:
+        return result.text
+    if result.error == 'no_content':
+        # Fallback if the extraction logic fails
+        return "Could not extract article text."
+    if result.error == 'http_error':
+        return f"Failed to fetch URL. Status code: {result.status_code}"
+    return f"An error occurred while fetching article: {result.detail}"
 
 
-def run_harvester():
-    """The main function to run the complete harvesting process."""
+def collect_article_metadata(on_urls=None):
+    """
+    Gathers article metadata from NewsAPI and the scraped site, without repeated URLs.
+    `on_urls` is called with the list of harvested URLs before any page is fetched,
+    e.g. to look up what we already stored about them.
+    """
     api_articles = fetch_news_from_api()
     scraped_articles = scrape_news_from_website()
     
     all_articles_metadata = api_articles + scraped_articles
     print(f"\n--- Found {len(all_articles_metadata)} total articles. Now fetching full content... ---")
     
-    final_articles = []
+    # Drop empty and repeated URLs up front so each page is only downloaded once
+    unique_articles = []
     processed_urls = set()
-    
     for article_meta in all_articles_metadata:
         url = article_meta['url']
         if url and url not in processed_urls:
-            print(f"Processing: {article_meta['headline']}")
-            content = fetch_full_article_text(url)
-            
-            if content and not content.startswith("Error"):
-                article_meta['content'] = content
-                final_articles.append(article_meta)
-                processed_urls.add(url)
+            unique_articles.append(article_meta)
+            processed_urls.add(url)
+
+    if on_urls is not None and unique_articles:
+        on_urls([a['url'] for a in unique_articles])
+    return unique_articles
+
+
+def _fetch_meta(article_meta):
+    print(f"Processing: {article_meta['headline']}")
+    return fetch_article(article_meta['url'])
+
+
+def run_harvester(concurrent=True, max_workers=None, on_urls=None):
+    """
+    The main function to run the complete harvesting process.
+    With `concurrent=True` the article pages are downloaded in parallel by a bounded
+    thread pool, so the run takes about as long as the slowest hosts instead of the
+    sum of every download.
+    """
+    unique_articles = collect_article_metadata(on_urls)
+
+    if concurrent and unique_articles:
+        workers = min(max_workers or MAX_CONCURRENT_FETCHES, len(unique_articles))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # executor.map keeps the results in the same order as the input
+            results = list(executor.map(_fetch_meta, unique_articles))
+    else:
+        results = [_fetch_meta(article_meta) for article_meta in unique_articles]
+
+    final_articles = []
+    failed = 0
+    for article_meta, result in zip(unique_articles, results):
+        # Failed fetches never become article content
+        if result.ok and result.text:
+            article_meta['content'] = result.text
+            final_articles.append(article_meta)
+        else:
+            failed += 1
+    if failed:
+        print(f"Skipped {failed} articles that could not be fetched or extracted.")
     
     return final_articles
+
+
+def iter_harvested_articles(max_workers=None, on_urls=None):
+    """
+    Streaming version of run_harvester: yields each article as soon as its page is fetched,
+    in completion order. Only about two fetches per worker are in flight at once, so when
+    the consumer is slow the downloads wait instead of piling up in memory.
+    """
+    unique_articles = collect_article_metadata(on_urls)
+    if not unique_articles:
+        return
+
+    workers = min(max_workers or MAX_CONCURRENT_FETCHES, len(unique_articles))
+    remaining = iter(unique_articles)
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        for article_meta in remaining:
+            in_flight[executor.submit(_fetch_meta, article_meta)] = article_meta
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                article_meta = in_flight.pop(future)
+                result = future.result()
+                if result.ok and result.text:
+                    article_meta['content'] = result.text
+                    yield article_meta
+                else:
+                    failed += 1
+                next_meta = next(remaining, None)
+                if next_meta is not None:
+                    in_flight[executor.submit(_fetch_meta, next_meta)] = next_meta
+    if failed:
+        print(f"Skipped {failed} articles that could not be fetched or extracted.")
     
 # --- UPDATE MAIN EXECUTION ---
 if __name__ == "__main__":
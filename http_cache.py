@@ -0,0 +1,154 @@
+# http_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# --- CONFIGURATION ---
+# Serverless platforms only let us write under the temp directory, so that's the default.
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ai-agent-cache"))
+HTTP_CACHE_MAX_MB = float(os.environ.get("HTTP_CACHE_MAX_MB", 200))
+
+
+class HTTPCache:
+    """
+    A small on-disk HTTP cache for conditional GETs.
+    Pages are stored with their ETag / Last-Modified headers. On the next request we send
+    If-None-Match / If-Modified-Since, and when the server answers 304 we serve the body
+    from disk. The least recently used pages are evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        if path is None:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            path = os.path.join(HTTP_CACHE_DIR, "http_cache.sqlite3")
+        self.path = path
+        self.max_bytes = max_bytes if max_bytes is not None else int(HTTP_CACHE_MAX_MB * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(responses)")]
+        if 'url' in columns:
+            # Caches written by older versions stored full URLs, API keys included. It's only a
+            # cache, so we drop it rather than keep those around.
+            self._conn.execute("DROP TABLE responses")
+            self._conn.commit()
+            # Freed pages still hold the old rows until they are overwritten
+            self._conn.execute("VACUUM")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                last_access REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(url):
+        # URLs can carry API keys in the query string, so we only store a hash of them as the key
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _lookup(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def _touch(self, key):
+        with self._lock:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def _store(self, key, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        # Nothing to revalidate against, so there's no point keeping the page
+        if not etag and not last_modified:
+            return
+        body = response.content
+        headers = json.dumps({'Content-Type': response.headers.get('Content-Type', '')})
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, last_modified, headers, body, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, headers, body, len(body), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops the least recently used pages until the cache fits in `max_bytes`. Caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    @staticmethod
+    def _cached_response(url, headers, body):
+        """Builds a regular 200 response from a stored page, so callers can't tell the difference."""
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(headers or '{}'))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def get(self, session, url, params=None, **kwargs):
+        """Performs a GET through `session`, revalidating against the cached copy when there is one."""
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        key = self._key(full_url)
+        cached = self._lookup(key)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached:
+            etag, last_modified, _, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = session.get(url, params=params, headers=headers, **kwargs)
+
+        if response.status_code == 304 and cached:
+            self._touch(key)
+            return self._cached_response(full_url, cached[2], cached[3])
+
+        response.from_cache = False
+        if response.status_code == 200:
+            self._store(key, response)
+        return response
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Returns the process-wide HTTP cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        return _default_cache
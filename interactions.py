@@ -0,0 +1,146 @@
+# interactions.py
+
+import asyncio
+import os
+import time
+
+from agent4_personalizer import record_user_interaction
+from metrics import metrics
+
+# --- CONFIGURATION ---
+# Interactions are buffered and written at most every INTERACTION_FLUSH_SECONDS, or as soon as
+# INTERACTION_MAX_PENDING are waiting. A user can queue INTERACTION_MAX_PER_USER between flushes.
+INTERACTION_FLUSH_SECONDS = float(os.environ.get("INTERACTION_FLUSH_SECONDS", 2))
+INTERACTION_MAX_PENDING = int(os.environ.get("INTERACTION_MAX_PENDING", 500))
+INTERACTION_MAX_PER_USER = int(os.environ.get("INTERACTION_MAX_PER_USER", 50))
+# How often a flush re-reads and re-applies a profile that another instance changed meanwhile
+INTERACTION_MAX_CONFLICT_RETRIES = int(os.environ.get("INTERACTION_MAX_CONFLICT_RETRIES", 3))
+
+
+class InteractionBuffer:
+    """
+    Coalesces bursts of interactions into batched profile writes.
+    A flush reads every affected profile in one query, applies each user's interactions in
+    order (with decay and pruning, see record_user_interaction), writes all profiles back in one
+    call and drops the users' cached feeds.
+    The write is a compare-and-swap on the profile's `version`: a profile another API instance
+    updated since we read it is not overwritten, but re-read and updated again.
+    """
+
+    def __init__(self, repository, feed_cache=None, flush_seconds=INTERACTION_FLUSH_SECONDS,
+                 max_pending=INTERACTION_MAX_PENDING, max_per_user=INTERACTION_MAX_PER_USER):
+        self.repository = repository
+        self.feed_cache = feed_cache
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self._pending = {}  # user_id -> [(timestamp, url)]
+        self._count = 0
+        self._timer = None
+        self._tasks = set()
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, user_id, url, now=None):
+        """Queues an interaction. Returns False if the user already has too many waiting."""
+        events = self._pending.setdefault(user_id, [])
+        if len(events) >= self.max_per_user:
+            metrics.inc('interactions_dropped_total')
+            return False
+        events.append((time.time() if now is None else now, url))
+        self._count += 1
+        metrics.inc('interactions_total')
+
+        if self._count >= self.max_pending:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self._start_flush)
+        return True
+
+    def _start_flush(self):
+        task = asyncio.get_running_loop().create_task(self.flush())
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _requeue(self, pending):
+        for user_id, events in pending.items():
+            waiting = self._pending.setdefault(user_id, [])
+            waiting[:0] = events[:max(0, self.max_per_user - len(waiting))]
+        self._count = sum(len(events) for events in self._pending.values())
+
+    async def _lookup_articles(self, urls):
+        """Articles by url, from the feed's candidate window where possible."""
+        found = {}
+        if self.feed_cache is not None:
+            for article in self.feed_cache.window.articles:
+                if article.get('url') in urls:
+                    found[article['url']] = article
+        missing = urls - found.keys()
+        if missing:
+            found.update(await self.repository.get_articles_by_url(missing))
+        return found
+
+    async def _write_profiles(self, events_by_user, articles):
+        """Reads, updates and conditionally writes the users' profiles; returns the conflicting ids."""
+        stored = await self.repository.get_interest_profiles(events_by_user)
+        profiles, expected_versions = {}, {}
+        for user_id, events in events_by_user.items():
+            profile = stored.get(user_id)
+            # None tells the database the user had no row yet
+            expected_versions[user_id] = None if profile is None else profile.get('version', 0)
+            profile = dict(profile or {})
+            for timestamp, url in events:
+                if url in articles:
+                    profile = record_user_interaction(profile, articles[url], now=timestamp)
+            profile['version'] = (expected_versions[user_id] or 0) + 1
+            profiles[user_id] = profile
+        return await self.repository.save_interest_profiles(profiles, expected_versions)
+
+    def _schedule_retry(self):
+        if self._timer is None and self._count:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self._start_flush)
+
+    async def flush(self):
+        """Writes every queued interaction. Returns the number of profiles updated."""
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending, self._count = self._pending, {}, 0
+            if not pending:
+                return 0
+
+            updated = set()
+            try:
+                with metrics.timer('profile_write'):
+                    urls = {url for events in pending.values() for _, url in events}
+                    articles = await self._lookup_articles(urls)
+                    # Users with at least one interaction we can apply
+                    remaining = {
+                        user_id: sorted(events, key=lambda event: event[0]) for user_id, events in pending.items()
+                        if any(url in articles for _, url in events)
+                    }
+                    for attempt in range(INTERACTION_MAX_CONFLICT_RETRIES + 1):
+                        if not remaining:
+                            break
+                        if attempt:
+                            metrics.inc('profile_write_conflicts_total', len(remaining))
+                        conflicts = await self._write_profiles(remaining, articles)
+                        updated.update(user_id for user_id in remaining if user_id not in conflicts)
+                        remaining = {user_id: remaining[user_id] for user_id in conflicts}
+            except Exception as e:
+                print(f"Could not write {len(pending) - len(updated)} interest profiles, retrying at the next flush: {e}")
+                # Profiles written before the failure already have their interactions
+                self._requeue({user_id: events for user_id, events in pending.items() if user_id not in updated})
+                self._schedule_retry()
+                return 0
+
+            if remaining:
+                # Still contended: leave these for the next flush
+                self._requeue({user_id: pending[user_id] for user_id in remaining})
+                self._schedule_retry()
+
+            if self.feed_cache is not None:
+                for user_id in updated:
+                    self.feed_cache.invalidate(user_id)
+            return len(updated)
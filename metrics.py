@@ -0,0 +1,237 @@
+# metrics.py
+
+import bisect
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+# Where the cron pipeline writes its JSON run reports (and cProfile output)
+METRICS_REPORT_DIR = os.environ.get(
+    "METRICS_REPORT_DIR", os.path.join(tempfile.gettempdir(), "ai-agent-cache", "reports")
+)
+METRICS_PREFIX = "ai_news_"
+# Histogram bucket upper bounds, in seconds: from a cached token check to a slow LLM call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Counts observations into fixed buckets, like a Prometheus histogram."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _quantile(buckets, counts, count, q):
+    """Estimates a quantile from bucket counts, interpolating inside the bucket."""
+    if not count:
+        return None
+    rank = q * count
+    seen = 0
+    for index, bucket_count in enumerate(counts):
+        if seen + bucket_count >= rank and bucket_count:
+            lower = buckets[index - 1] if index > 0 else 0.0
+            # Past the last bucket all we know is the lower bound
+            upper = buckets[index] if index < len(buckets) else lower
+            return round(lower + (upper - lower) * (rank - seen) / bucket_count, 6)
+        seen += bucket_count
+    return buckets[-1]
+
+
+def _label_text(labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels)
+
+
+def _series(name, labels):
+    label_text = _label_text(labels)
+    return f"{name}{{{label_text}}}" if label_text else name
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and latency histograms, keyed by name and labels.
+    Recording is a dictionary update under a lock, cheap enough for per-article timings.
+    Worker processes (e.g. CLEANER_WORKERS > 1) keep their own registry, which isn't exported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Times the block as `stage_seconds{stage=...}`; an exception also counts as a stage error."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc('stage_errors_total', stage=stage, **labels)
+            raise
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def error(self, stage, **labels):
+        """Counts a stage failure that didn't raise (e.g. a fetch that returned no content)."""
+        self.inc('stage_errors_total', stage=stage, **labels)
+
+    def cache(self, cache, hits, misses):
+        self.inc('cache_hits_total', hits, cache=cache)
+        self.inc('cache_misses_total', misses, cache=cache)
+
+    def snapshot(self):
+        """A copy of every metric, for run reports."""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {
+                    key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+                },
+            }
+
+    def to_prometheus(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(snapshot['counters'].items()):
+            full_name = METRICS_PREFIX + name
+            if full_name not in typed:
+                lines.append(f"# TYPE {full_name} counter")
+                typed.add(full_name)
+            lines.append(f"{_series(full_name, labels)} {value}")
+        for (name, labels), (buckets, counts, total, count) in sorted(snapshot['histograms'].items()):
+            full_name = METRICS_PREFIX + name
+            if full_name not in typed:
+                lines.append(f"# TYPE {full_name} histogram")
+                typed.add(full_name)
+            label_text = _label_text(labels)
+            separator = ',' if label_text else ''
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f'{full_name}_bucket{{{label_text}{separator}le="{bound}"}} {cumulative}')
+            lines.append(f"{_series(full_name + '_sum', labels)} {total}")
+            lines.append(f"{_series(full_name + '_count', labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def run_report(after, before=None):
+    """
+    Summarizes what happened between two snapshots: per-stage latency (count, total, mean,
+    p50, p95, p99) and error rate, and per-cache hit rate. Built to be dumped as JSON.
+    """
+    before = before or {'counters': {}, 'histograms': {}}
+    counters = {
+        key: value - before['counters'].get(key, 0) for key, value in after['counters'].items()
+    }
+    stages = {}
+    for key, (buckets, counts, total, count) in after['histograms'].items():
+        name, labels = key
+        if key in before['histograms']:
+            _, old_counts, old_total, old_count = before['histograms'][key]
+            counts = [new - old for new, old in zip(counts, old_counts)]
+            total, count = total - old_total, count - old_count
+        if not count or name != 'stage_seconds':
+            continue
+        # e.g. "rank" or "rank:incremental"
+        label = ':'.join([dict(labels)['stage']] + [str(value) for key, value in labels if key != 'stage'])
+        errors = counters.get(('stage_errors_total', labels), 0)
+        stages[label] = {
+            'count': count,
+            'total_seconds': round(total, 4),
+            'mean_seconds': round(total / count, 6),
+            'p50_seconds': _quantile(buckets, counts, count, 0.5),
+            'p95_seconds': _quantile(buckets, counts, count, 0.95),
+            'p99_seconds': _quantile(buckets, counts, count, 0.99),
+            'errors': errors,
+            'error_rate': round(errors / count, 4),
+        }
+
+    caches = {}
+    for (name, labels), value in counters.items():
+        if name in ('cache_hits_total', 'cache_misses_total'):
+            entry = caches.setdefault(dict(labels)['cache'], {'hits': 0, 'misses': 0})
+            entry['hits' if name == 'cache_hits_total' else 'misses'] += value
+    for name, entry in list(caches.items()):
+        lookups = entry['hits'] + entry['misses']
+        if not lookups:
+            del caches[name]
+            continue
+        entry['hit_rate'] = round(entry['hits'] / lookups, 4)
+
+    other = {
+        _series(name, labels): value for (name, labels), value in counters.items()
+        if value and name not in ('cache_hits_total', 'cache_misses_total', 'stage_errors_total')
+    }
+    return {'stages': stages, 'caches': caches, 'counters': other}
+
+
+def write_report(report, name):
+    """Writes a JSON report to METRICS_REPORT_DIR and returns its path."""
+    os.makedirs(METRICS_REPORT_DIR, exist_ok=True)
+    path = os.path.join(METRICS_REPORT_DIR, f"{name}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+
+class Profiler:
+    """Collects cProfile data from several threads (cProfile only sees the thread it runs in)."""
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def run(self, function, *args, **kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def save(self, name, top=25):
+        """Dumps the merged profile next to the run reports, prints the top functions, returns the path."""
+        if not self._profiles:
+            return None
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        os.makedirs(METRICS_REPORT_DIR, exist_ok=True)
+        path = os.path.join(METRICS_REPORT_DIR, f"{name}.prof")
+        stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(top)
+        return path
+
+
+# The registry every module records into
+metrics = MetricsRegistry()
@@ -0,0 +1,402 @@
+# pipeline.py
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from harvester import run_harvester, iter_harvested_articles
+from agent2_cleaner import CleanerTaggerAgent
+from agent3_summarizer import (
+    SummarizerAgent, RateLimiter, SUMMARIZER_DEADLINE_SECONDS
+)
+from url_index import SeenURLIndex, record_known_urls, drop_unchanged_articles, is_unchanged_article, content_hash
+from quality_gate import filter_articles, rejection_reason
+from dedupe import cluster_near_duplicates, NearDuplicateIndex
+from metrics import metrics, run_report, write_report, Profiler
+
+# --- CONFIGURATION ---
+# 'streaming' overlaps harvesting, tagging, summarizing and uploading;
+# 'batch' runs them one after the other over the whole harvest
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "streaming")
+# Articles waiting between two stages. A full queue makes the stage before it wait,
+# so at most a few queues' worth of articles are in memory at once.
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 32))
+# Batch size and worker threads for each stage
+TAG_BATCH_SIZE = int(os.environ.get("PIPELINE_TAG_BATCH_SIZE", 16))
+TAG_WORKERS = int(os.environ.get("PIPELINE_TAG_WORKERS", 1))
+SUMMARIZE_BATCH_SIZE = int(os.environ.get("PIPELINE_SUMMARIZE_BATCH_SIZE", 8))
+# Each summarize worker gets an equal share of the Gemini rate limits
+SUMMARIZE_WORKERS = int(os.environ.get("PIPELINE_SUMMARIZE_WORKERS", 2))
+UPLOAD_BATCH_SIZE = int(os.environ.get("PIPELINE_UPLOAD_BATCH_SIZE", 50))
+UPLOAD_WORKERS = 1
+# How long a stage waits for a full batch before it works on what it has
+BATCH_WAIT_SECONDS = 0.5
+
+# --- UPLOAD AND TIME BUDGET SETTINGS ---
+# Rows per upsert request. Every stored chunk is a checkpoint: its URLs are skipped next run.
+UPSERT_CHUNK_SIZE = int(os.environ.get("UPSERT_CHUNK_SIZE", 25))
+UPSERT_MAX_RETRIES = int(os.environ.get("UPSERT_MAX_RETRIES", 3))
+UPSERT_BACKOFF_SECONDS = float(os.environ.get("UPSERT_BACKOFF_SECONDS", 1.0))
+# With a time budget, we stop taking new articles this long before it runs out,
+# so the articles already in the pipeline can still be tagged, summarized and stored
+PIPELINE_STOP_INTAKE_SECONDS = float(os.environ.get("PIPELINE_STOP_INTAKE_SECONDS", 60))
+# ...and summaries must be done this long before the end, leaving time for the last upserts
+PIPELINE_UPLOAD_RESERVE_SECONDS = float(os.environ.get("PIPELINE_UPLOAD_RESERVE_SECONDS", 15))
+# Set to 1 to capture a cProfile of the next run alongside its report
+PIPELINE_PROFILE = os.environ.get("PIPELINE_PROFILE") == "1"
+
+_DONE = object()
+
+
+def to_db_record(article):
+    """
+    The `articles` table row for a processed article.
+    `cluster_id` and `content_hash` need the columns added in supabase/migrations.
+    """
+    # The 'entities' field is a dictionary, which will be saved as JSONB
+    return {
+        'headline': article.get('headline'),
+        'url': article.get('url'),
+        'summary': article.get('summary'),
+        'category': article.get('category'),
+        'entities': article.get('entities'),
+        'content': article.get('content'),
+        'cluster_id': article.get('cluster_id'),
+        # Lets a runner with an empty url_index tell unchanged articles apart (record_known_urls)
+        'content_hash': article.get('content_hash'),
+    }
+
+
+def upload_articles(supabase, articles, on_chunk_stored=None, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Upserts processed articles in chunks; 'upsert' updates existing rows when the URL matches.
+    A failed chunk is retried with exponential backoff, and skipped if it keeps failing.
+    `on_chunk_stored(chunk)` is called after each stored chunk. Returns the stored articles.
+    """
+    stored = []
+    for start in range(0, len(articles), chunk_size):
+        chunk = articles[start:start + chunk_size]
+        records = [to_db_record(a) for a in chunk]
+        for attempt in range(UPSERT_MAX_RETRIES + 1):
+            try:
+                with metrics.timer('upsert'):
+                    supabase.table('articles').upsert(records, on_conflict='url').execute()
+                break
+            except Exception as e:
+                if attempt == UPSERT_MAX_RETRIES:
+                    print(f"Error uploading {len(chunk)} articles to Supabase, leaving them for the next run: {e}")
+                    chunk = None
+                    break
+                delay = UPSERT_BACKOFF_SECONDS * (2 ** attempt)
+                print(f"Upsert failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        if chunk is not None:
+            stored.extend(chunk)
+            if on_chunk_stored is not None:
+                on_chunk_stored(chunk)
+    return stored
+
+
+class Deadline:
+    """
+    The time budget of one run (None means no limit). The streaming pipeline stops taking
+    new articles once `accepting()` turns False; whatever it didn't get to stays new and is
+    picked up by the next run.
+    """
+
+    def __init__(self, budget_seconds=None):
+        self.ends_at = None if budget_seconds is None else time.monotonic() + budget_seconds
+
+    def remaining(self):
+        return None if self.ends_at is None else max(0.0, self.ends_at - time.monotonic())
+
+    def accepting(self):
+        return self.ends_at is None or self.remaining() > PIPELINE_STOP_INTAKE_SECONDS
+
+    def summarizer_deadline(self):
+        """Seconds a summarize call may take, so it finishes before the upload reserve."""
+        if self.ends_at is None:
+            return SUMMARIZER_DEADLINE_SECONDS
+        return max(1.0, min(SUMMARIZER_DEADLINE_SECONDS, self.remaining() - PIPELINE_UPLOAD_RESERVE_SECONDS))
+
+
+def finished_articles(articles):
+    """
+    Drops articles without a real summary: cut off by a deadline, or an "Error: ..." left by a
+    failed Gemini call. They are neither stored nor checkpointed, so the next run retries them.
+    """
+    finished = [a for a in articles if not (a.get('summary') or '').startswith('Error')]
+    if len(finished) < len(articles):
+        print(f"Holding back {len(articles) - len(finished)} articles without a summary for the next run.")
+    return finished
+
+
+def _take_batch(inbox, batch_size):
+    """
+    Waits for one item, then takes whatever else arrives within BATCH_WAIT_SECONDS,
+    up to `batch_size`. Returns (batch, done), where `done` means the stream has ended.
+    """
+    item = inbox.get()
+    if item is _DONE:
+        return [], True
+    batch = [item]
+    deadline = time.monotonic() + BATCH_WAIT_SECONDS
+    while len(batch) < batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = inbox.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+class Stage:
+    """
+    One step of the streaming pipeline: `workers` threads take batches from `inbox`,
+    run `process` on each batch and put the results on `outbox`.
+    A batch that fails is reported and dropped; the rest of the stream carries on.
+    """
+
+    def __init__(self, name, process, inbox, outbox=None, batch_size=1, workers=1, profiler=None):
+        self.name = name
+        self.process = process
+        self.inbox = inbox
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self._running = workers
+        self._lock = threading.Lock()
+        target = self._work if profiler is None else (lambda: profiler.run(self._work))
+        self._threads = [
+            threading.Thread(target=target, name=f"pipeline-{name}-{i}", daemon=True) for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            batch, done = _take_batch(self.inbox, self.batch_size)
+            if batch:
+                try:
+                    with metrics.timer(f"pipeline_{self.name}"):
+                        results = self.process(batch)
+                except Exception as e:
+                    print(f"Pipeline stage '{self.name}' failed on a batch of {len(batch)} articles: {e}")
+                    results = []
+                    with self._lock:
+                        self.failed += len(batch)
+                with self._lock:
+                    self.processed += len(results)
+                metrics.inc('pipeline_articles_total', len(results), stage=self.name)
+                if self.outbox is not None:
+                    for result in results:
+                        self.outbox.put(result)
+            if done:
+                # Let the other workers of this stage see the end of the stream too
+                self.inbox.put(_DONE)
+                break
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.outbox is not None:
+            self.outbox.put(_DONE)
+
+
+def run_streaming_pipeline(supabase, cleaner_agent, summarizer_agent, url_index, incremental=True, deadline=None,
+                           profiler=None):
+    """
+    Harvest -> tag -> summarize -> upload, connected by bounded queues so the stages overlap:
+    pages keep downloading while Flair tags earlier articles and Gemini summarizes the ones
+    before that. Each article is dropped from memory once its batch is uploaded.
+    With a `deadline`, intake stops early enough for the articles already taken to be stored.
+    """
+    deadline = deadline or Deadline()
+    harvested = queue.Queue(PIPELINE_QUEUE_SIZE)
+    tagged = queue.Queue(PIPELINE_QUEUE_SIZE)
+    summarized = queue.Queue(PIPELINE_QUEUE_SIZE)
+    # One limiter for every summarize worker, so together they stay under the Gemini quota
+    limiter = RateLimiter()
+
+    def summarize(batch):
+        results = summarizer_agent.summarize_articles(
+            batch, limiter=limiter, deadline=deadline.summarizer_deadline()
+        )
+        return finished_articles(results)
+
+    upload_failures = []
+
+    def upload(batch):
+        # Remember each stored chunk right away so the next run can skip it
+        stored = upload_articles(supabase, batch, on_chunk_stored=url_index.add_articles)
+        if len(stored) < len(batch):
+            upload_failures.append(len(batch) - len(stored))
+        print(f"Uploaded {len(stored)} articles to Supabase.")
+        return stored
+
+    stages = [
+        Stage('tag', cleaner_agent.process_articles, harvested, tagged, TAG_BATCH_SIZE, TAG_WORKERS, profiler).start(),
+        Stage('summarize', summarize, tagged, summarized, SUMMARIZE_BATCH_SIZE, SUMMARIZE_WORKERS, profiler).start(),
+        Stage('upload', upload, summarized, None, UPLOAD_BATCH_SIZE, UPLOAD_WORKERS, profiler).start(),
+    ]
+
+    # The harvest stage runs on this thread. The gates that batch mode applies to the
+    # whole harvest (quality, unchanged content, near-duplicates) run per article here.
+    near_duplicates = NearDuplicateIndex()
+    duplicate_records = []
+    queued = 0
+    counts = {'harvested': 0, 'rejected': 0, 'unchanged': 0, 'duplicates': 0, 'deferred': False}
+    on_urls = (lambda urls: record_known_urls(urls, supabase, url_index)) if incremental else None
+    harvest = iter_harvested_articles(on_urls=on_urls)
+    try:
+        for article in harvest:
+            if not deadline.accepting():
+                print("Time budget nearly used up: not taking new articles, the next run picks up the rest.")
+                counts['deferred'] = True
+                break
+            counts['harvested'] += 1
+            if rejection_reason(article) is not None:
+                counts['rejected'] += 1
+                continue
+            if not incremental:
+                article['content_hash'] = content_hash(article['content'])
+            elif is_unchanged_article(article, url_index):
+                counts['unchanged'] += 1
+                continue
+            article['clean_content'] = cleaner_agent.clean_text(article['content'])
+            if not near_duplicates.add(article):
+                counts['duplicates'] += 1
+                duplicate_records.append((article['url'], article['content_hash']))
+                continue
+            # Blocks while the tag stage is behind
+            harvested.put(article)
+            queued += 1
+    finally:
+        # Waits for the downloads still in flight, then lets the stages drain
+        harvest.close()
+        harvested.put(_DONE)
+        for stage in stages:
+            stage.join()
+
+    failed = sum(stage.failed for stage in stages) + sum(upload_failures)
+    counts['uploaded'] = stages[-1].processed
+    # Duplicates are only marked as seen once every representative made it into the table
+    if duplicate_records and counts['uploaded'] == queued:
+        url_index.add(duplicate_records)
+    counts['failed'] = failed
+    print(f"Streaming pipeline: harvested {counts['harvested']}, rejected {counts['rejected']}, "
+          f"unchanged {counts['unchanged']}, near-duplicates {counts['duplicates']}, "
+          f"uploaded {counts['uploaded']}, failed {counts['failed']}.")
+    return counts
+
+
+def run_batch_pipeline(supabase, cleaner_agent, summarizer_agent, url_index, incremental=True, deadline=None):
+    """Runs each step over the whole harvest before starting the next one."""
+    deadline = deadline or Deadline()
+    print("Starting Agent 1: Harvester...")
+    on_urls = (lambda urls: record_known_urls(urls, supabase, url_index)) if incremental else None
+    raw_articles = run_harvester(on_urls=on_urls)
+    harvested = len(raw_articles)
+    # Fetch errors, paywalls and near-empty pages stop here, before any NER or LLM work
+    raw_articles = filter_articles(raw_articles)
+    if incremental:
+        raw_articles = drop_unchanged_articles(raw_articles, url_index)
+    else:
+        for article in raw_articles:
+            article['content_hash'] = content_hash(article['content'])
+    if not raw_articles:
+        print("Harvester found no articles. Exiting pipeline.")
+        return {'harvested': harvested, 'uploaded': 0, 'failed': 0}
+    # Near-duplicate stories (syndicated copies, the same story from two sources)
+    # are clustered, and only one representative per cluster is enriched
+    for article in raw_articles:
+        article['clean_content'] = cleaner_agent.clean_text(article['content'])
+    raw_articles, duplicate_articles = cluster_near_duplicates(raw_articles)
+    print(f"Harvested {len(raw_articles)} articles.")
+    print("-" * 30)
+
+    print("Starting Agents 2 & 3: Cleaner, Tagger, and Summarizer...")
+    # Agent 2: clean and tag the whole batch with one batched NER call
+    cleaned_articles = cleaner_agent.process_articles(raw_articles)
+    # Agent 3: summarize concurrently, within the Gemini rate limits
+    final_articles = summarizer_agent.summarize_articles(cleaned_articles, deadline=deadline.summarizer_deadline())
+    for final_article in final_articles:
+        print(f"Processed: {final_article['headline']}")
+    print("Finished processing all articles.")
+    print("-" * 30)
+
+    final_articles = finished_articles(final_articles)
+    print(f"Uploading {len(final_articles)} articles to Supabase...")
+    # Remember each stored chunk right away so the next run can skip it
+    stored = upload_articles(supabase, final_articles, on_chunk_stored=url_index.add_articles)
+    if len(stored) == len(cleaned_articles):
+        print(f"Successfully uploaded/updated articles in Supabase.")
+        # Duplicates are only marked as seen once every representative made it into the table
+        url_index.add_articles(duplicate_articles)
+    return {'harvested': harvested, 'uploaded': len(stored), 'failed': len(final_articles) - len(stored)}
+
+
+def run_pipeline(supabase, incremental=True, mode=None, time_budget=None, profile=None):
+    """
+    Runs the AI news pipeline (Agents 1-3) and saves the results to Supabase.
+    In incremental mode, stored articles are revalidated (a conditional GET) and only new or
+    changed ones go through NER and summarization; otherwise everything is reprocessed.
+    With a `time_budget` (seconds), the run stops taking new work in time to store what it
+    has; the next run resumes from there.
+    Every run writes a JSON report of per-stage timings, error and cache hit rates to
+    METRICS_REPORT_DIR; with `profile` (or PIPELINE_PROFILE=1) a cProfile dump goes next to it.
+    Returns a dict of article counts for the run, including the report's path.
+    """
+    deadline = Deadline(time_budget)
+    mode = mode or PIPELINE_MODE
+    profiler = Profiler() if (PIPELINE_PROFILE if profile is None else profile) else None
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    before = metrics.snapshot()
+
+    print("Initializing agents...")
+    with metrics.timer('pipeline_init'):
+        cleaner_agent = CleanerTaggerAgent()
+        summarizer_agent = SummarizerAgent()
+        url_index = SeenURLIndex()
+    print("-" * 30)
+
+    if mode == 'batch':
+        run = run_batch_pipeline
+        args = (supabase, cleaner_agent, summarizer_agent, url_index, incremental, deadline)
+    else:
+        run = run_streaming_pipeline
+        args = (supabase, cleaner_agent, summarizer_agent, url_index, incremental, deadline, profiler)
+    try:
+        counts = profiler.run(run, *args) if profiler else run(*args)
+    finally:
+        cleaner_agent.close()
+
+    run_name = f"run-{started_at.strftime('%Y%m%dT%H%M%S.%fZ')}"
+    report = {
+        'started_at': started_at.isoformat(),
+        'duration_seconds': round(time.perf_counter() - start, 3),
+        'mode': mode,
+        'counts': counts,
+        **run_report(metrics.snapshot(), before),
+    }
+    if profiler:
+        report['profile'] = profiler.save(run_name)
+    counts['report'] = write_report(report, run_name)
+    print(f"Run report written to {counts['report']}")
+    return counts
@@ -0,0 +1,64 @@
+# quality_gate.py
+
+import os
+import re
+
+# --- CONFIGURATION ---
+# Articles shorter than this are not worth tagging or summarizing
+MIN_CONTENT_WORDS = int(os.environ.get("MIN_CONTENT_WORDS", 80))
+# Pages with a blocker phrase are only rejected when they are this short;
+# a real article can mention cookies or subscriptions further down
+BOILERPLATE_MAX_WORDS = int(os.environ.get("BOILERPLATE_MAX_WORDS", 300))
+
+# The messages harvester.fetch_full_article_text returns instead of article text (older runs
+# stored them as content), and the "Error: ..." / "Error fetching ..." forms of other error
+# paths. Only these exact sentinels are rejected: a real article can start with "Error".
+FETCH_ERROR_PREFIXES = (
+    "Failed to fetch URL. Status code:",
+    "An error occurred while fetching article:",
+    "Could not extract article text.",
+    "Error: ",
+    "Error fetching ",
+)
+
+# What paywalls, bot checks and consent walls put on the page instead of the article
+BOILERPLATE_RE = re.compile(
+    r"enable javascript|javascript is disabled|access denied|are you a robot|verify you are human"
+    r"|captcha|subscribe to (continue|read)|already a subscriber|sign in to continue"
+    r"|accept (all )?cookies|page not found|403 forbidden|404 not found",
+    re.IGNORECASE,
+)
+
+
+def rejection_reason(article):
+    """Returns why an article should not be enriched, or None if it looks like a real article."""
+    content = (article.get('content') or '').strip()
+    if not content:
+        return 'empty'
+    if content.startswith(FETCH_ERROR_PREFIXES):
+        return 'fetch_error'
+    word_count = len(content.split())
+    if word_count < BOILERPLATE_MAX_WORDS and BOILERPLATE_RE.search(content):
+        return 'boilerplate'
+    if word_count < MIN_CONTENT_WORDS:
+        return 'too_short'
+    return None
+
+
+def filter_articles(articles):
+    """
+    Keeps only the articles that pass the quality gate, so fetch failures and near-empty
+    pages never reach Flair, the LLM or the `articles` table.
+    """
+    passed = []
+    rejected = {}
+    for article in articles:
+        reason = rejection_reason(article)
+        if reason is None:
+            passed.append(article)
+        else:
+            rejected[reason] = rejected.get(reason, 0) + 1
+    if rejected:
+        summary = ', '.join(f"{count} {reason}" for reason, count in sorted(rejected.items()))
+        print(f"Quality gate: kept {len(passed)} of {len(articles)} articles (rejected {summary}).")
+    return passed
@@ -0,0 +1,89 @@
+# repository.py
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIGURATION ---
+# Threads available for Supabase queries. supabase-py is synchronous, so this is how many
+# queries the API can have in flight at once; they all share the client's HTTP connection pool.
+REPOSITORY_WORKERS = int(os.environ.get("REPOSITORY_WORKERS", 32))
+# Columns the feed ranks on or can return. The full `content` stays in the database.
+# `cluster_id` and `updated_at` are added by supabase/migrations.
+FEED_ARTICLE_COLUMNS = "url,headline,summary,category,entities,cluster_id,created_at,updated_at"
+
+
+class SupabaseRepository:
+    """
+    Async access to the tables the API reads and the profile writes it makes.
+    Each query runs on a dedicated thread pool, so a slow round trip to Supabase never blocks
+    the event loop and concurrent requests (or the two queries of one request) overlap.
+    """
+
+    def __init__(self, client, max_workers=REPOSITORY_WORKERS):
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='supabase')
+
+    async def _execute(self, query):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self._executor, query.execute)
+        return response.data
+
+    async def get_user_profile(self, user_id):
+        """Returns a user's interest profile, or an empty one if they don't have one yet."""
+        try:
+            data = await self._execute(
+                self.client.table('user_profiles').select("interest_profile").eq('id', user_id).single()
+            )
+        except Exception:
+            return {"categories": {}, "entities": {}}
+        interest_profile = (data or {}).get('interest_profile') or {}
+        return {
+            "categories": interest_profile.get('categories', {}),
+            "entities": interest_profile.get('entities', {}),
+        }
+
+    async def get_recent_articles(self, since, limit):
+        """
+        Without `since`, returns the newest articles. With it, returns the articles inserted or
+        updated at or after `since` (their updated_at), oldest change first, so callers can page.
+        """
+        query = self.client.table('articles').select(FEED_ARTICLE_COLUMNS)
+        if since:
+            query = query.gte('updated_at', since).order('updated_at').limit(limit)
+        else:
+            query = query.order('created_at', desc=True).limit(limit)
+        return await self._execute(query)
+
+    async def get_interest_profiles(self, user_ids):
+        """Returns {user_id: stored interest profile} for the given users, in one query."""
+        data = await self._execute(
+            self.client.table('user_profiles').select("id,interest_profile").in_('id', list(user_ids))
+        )
+        return {row['id']: row.get('interest_profile') or {} for row in data or []}
+
+    async def save_interest_profiles(self, profiles_by_user, expected_versions):
+        """
+        Writes several users' interest profiles in one call, each only if the stored profile is
+        still at `expected_versions[user_id]` (None: the user had no row). Returns the user ids
+        whose profile changed in the meantime and was not written.
+        Needs the save_interest_profiles function, see supabase/migrations.
+        """
+        updates = [
+            {'id': user_id, 'profile': profile, 'expected_version': expected_versions.get(user_id)}
+            for user_id, profile in profiles_by_user.items()
+        ]
+        if not updates:
+            return set()
+        data = await self._execute(self.client.rpc('save_interest_profiles', {'updates': updates}))
+        return {row['conflicted_id'] for row in data or []}
+
+    async def get_articles_by_url(self, urls):
+        """Returns {url: article} with the fields interactions need, for the urls that exist."""
+        data = await self._execute(
+            self.client.table('articles').select("url,category,entities").in_('url', list(urls))
+        )
+        return {row['url']: row for row in data or []}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,115 @@
+# result_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from metrics import metrics
+
+# --- CONFIGURATION ---
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ai-agent-cache"))
+
+
+def make_key(*parts):
+    """Builds a cache key from a hash of all the parts (content, model name, versions...)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    A persistent key/value cache for expensive results (NER tags, summaries...).
+    Values are stored as JSON in a sqlite file, one table per cache name.
+    Entries older than `max_age` seconds are treated as missing, and once there are more
+    than `max_entries` the least recently used ones are evicted.
+    """
+
+    def __init__(self, name, path=None, max_entries=10000, max_age=None):
+        if path is None:
+            os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+            path = os.path.join(RESULT_CACHE_DIR, "results.sqlite3")
+        self.name = name
+        self.table = f"cache_{name}"
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value TEXT, created_at REAL, last_access REAL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_access ON {self.table} (last_access)")
+        self._conn.commit()
+
+    def _is_fresh(self, created_at, now):
+        return self.max_age is None or now - created_at <= self.max_age
+
+    def get_many(self, keys):
+        """Returns {key: value} for the keys that are cached and not expired."""
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, created_at FROM {self.table} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self._is_fresh(created_at, now):
+                        found[key] = json.loads(value)
+            if found:
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        metrics.cache(self.name, len(found), len(keys) - len(found))
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items):
+        """Stores a {key: value} mapping, then applies age and size eviction."""
+        now = time.time()
+        rows = [(key, json.dumps(value), now, now) for key, value in items.items()]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)", rows)
+            self._evict(now)
+            self._conn.commit()
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def _evict(self, now):
+        """Drops expired entries and the least recently used ones past `max_entries`. Caller holds the lock."""
+        if self.max_age is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.max_age,))
+        if self.max_entries is not None:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,6 @@
+-- Near-duplicate cluster of each stored article (dedupe.py). The pipeline writes it with
+-- every upsert (pipeline.to_db_record) and /feed selects it (repository.FEED_ARTICLE_COLUMNS),
+-- so this must be applied before deploying either.
+
+alter table articles add column if not exists cluster_id text;
+create index if not exists articles_cluster_id_idx on articles (cluster_id);
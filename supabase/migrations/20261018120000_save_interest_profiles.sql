@@ -0,0 +1,40 @@
+-- Batched compare-and-swap writes of interest profiles (interactions.py, POST /interactions).
+--
+-- Each update is {"id": ..., "profile": {...}, "expected_version": n | null}. A profile is
+-- written only if the stored one still has `expected_version` (interest_profile->>'version',
+-- 0 when missing); null means the user had no row when it was read, so the row is inserted
+-- unless someone else created it first. Returns the ids that were not written: the caller
+-- re-reads those profiles, re-applies its interactions and tries again.
+-- Each row is checked and written by a single statement, so concurrent API instances
+-- can't overwrite each other's updates.
+
+create or replace function save_interest_profiles(updates jsonb)
+returns table (conflicted_id text)
+language plpgsql
+as $$
+declare
+    u jsonb;
+    affected integer;
+begin
+    for u in select * from jsonb_array_elements(updates) loop
+        if jsonb_typeof(u->'expected_version') is distinct from 'number' then
+            insert into user_profiles (id, interest_profile)
+            select r.id, r.interest_profile
+            from jsonb_populate_record(
+                null::user_profiles, jsonb_build_object('id', u->>'id', 'interest_profile', u->'profile')
+            ) as r
+            on conflict (id) do nothing;
+        else
+            update user_profiles
+            set interest_profile = u->'profile'
+            where id::text = u->>'id'
+              and coalesce((interest_profile->>'version')::bigint, 0) = (u->>'expected_version')::bigint;
+        end if;
+        get diagnostics affected = row_count;
+        if affected = 0 then
+            conflicted_id := u->>'id';
+            return next;
+        end if;
+    end loop;
+end;
+$$;
@@ -0,0 +1,21 @@
+-- When each article was last inserted or updated. The API's candidate window (feed_cache.py)
+-- polls for rows changed since the newest updated_at it has, so re-summarized or re-tagged
+-- articles (re-upserted by url) reach cached feeds, not only new ones.
+
+alter table articles add column if not exists updated_at timestamptz not null default now();
+create index if not exists articles_updated_at_idx on articles (updated_at);
+
+create or replace function set_articles_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists articles_set_updated_at on articles;
+create trigger articles_set_updated_at
+    before update on articles
+    for each row execute function set_articles_updated_at();
@@ -0,0 +1,6 @@
+-- Hash of each stored article's raw content (url_index.content_hash). The pipeline writes it
+-- with every upsert (pipeline.to_db_record) and reads it back for URLs its local index doesn't
+-- know (url_index.record_known_urls), so a fresh runner still skips unchanged articles.
+-- Rows stored before this column existed keep a null hash and are reprocessed once.
+
+alter table articles add column if not exists content_hash text;
@@ -0,0 +1,80 @@
+# tests/test_auth.py
+
+import asyncio
+import time
+
+import pytest
+from jose import jwt
+
+from auth import TokenVerifier, AuthenticatedUser, InvalidToken
+
+SECRET = "test-secret"
+
+
+def make_token(expires_in, secret=SECRET, **claims):
+    payload = {'sub': 'user-1', 'aud': 'authenticated', 'exp': int(time.time() + expires_in), **claims}
+    return jwt.encode(payload, secret)
+
+
+class RemoteAuth:
+    """Stands in for supabase.auth.get_user: accepts tokens until their exp, counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        if jwt.get_unverified_claims(token)['exp'] <= time.time():
+            raise InvalidToken("Token has expired")
+        return AuthenticatedUser('user-1', None, 'authenticated', {})
+
+
+def test_local_token_is_verified_and_cached():
+    verifier = TokenVerifier(jwt_secret=SECRET, jwks_url=None)
+    token = make_token(60)
+    assert asyncio.run(verifier.verify(token)).id == 'user-1'
+    assert asyncio.run(verifier.verify(token)).id == 'user-1'
+    assert (verifier.hits, verifier.misses) == (1, 1)
+
+
+def test_local_token_with_wrong_signature_is_rejected():
+    verifier = TokenVerifier(jwt_secret=SECRET, jwks_url=None)
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(make_token(60, secret="another-secret")))
+
+
+def test_expired_local_token_is_rejected():
+    verifier = TokenVerifier(jwt_secret=SECRET, jwks_url=None)
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(make_token(-10)))
+
+
+def test_remotely_verified_token_is_cached_only_until_its_exp():
+    remote = RemoteAuth()
+    verifier = TokenVerifier(jwt_secret=None, jwks_url=None, remote_verify=remote)
+    token = make_token(1)
+
+    assert asyncio.run(verifier.verify(token)).id == 'user-1'
+    assert asyncio.run(verifier.verify(token)).id == 'user-1'
+    assert remote.calls == 1
+
+    time.sleep(max(0.0, jwt.get_unverified_claims(token)['exp'] - time.time()) + 0.1)
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
+    assert remote.calls == 2
+
+
+def test_remotely_verified_token_without_exp_is_not_cached():
+    remote_user = AuthenticatedUser('user-1', None, 'authenticated', {})
+    verifier = TokenVerifier(jwt_secret=None, jwks_url=None, remote_verify=lambda token: remote_user)
+    token = jwt.encode({'sub': 'user-1'}, "unknown-secret")
+    asyncio.run(verifier.verify(token))
+    asyncio.run(verifier.verify(token))
+    assert verifier.hits == 0
+
+
+def test_unsupported_algorithm_is_rejected():
+    verifier = TokenVerifier(jwt_secret=SECRET, jwks_url=None)
+    token = jwt.encode({'sub': 'user-1'}, SECRET, algorithm='HS512')
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
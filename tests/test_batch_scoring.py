@@ -0,0 +1,33 @@
+# tests/test_batch_scoring.py
+
+import pytest
+
+from agent4_personalizer import PersonalizationAgent
+from batch_scoring import score_feeds
+
+ARTICLES = [
+    {'url': 'a', 'category': 'Technology', 'entities': {'ORG': ['Google']}},
+    {'url': 'b', 'category': 'Sports', 'entities': {}},
+    {'url': 'c', 'category': 'Technology', 'entities': {}},
+    {'url': 'd', 'category': 'General', 'entities': {'ORG': ['Google']}},
+    {'url': 'e', 'category': 'Technology', 'entities': {}},
+]
+PROFILES = {
+    'tech': {'categories': {'Technology': 1.0}, 'entities': {'Google': 1.0}},
+    'sport': {'categories': {'Sports': 2.0}, 'entities': {}},
+    'empty': {'categories': {}, 'entities': {}},
+}
+
+
+@pytest.mark.parametrize('k', [0, 1, 2, 3, 5, 10])
+def test_matches_rank_articles_for_user(k):
+    agent = PersonalizationAgent()
+    feeds = score_feeds(PROFILES, ARTICLES, k=k)
+    for user_id, profile in PROFILES.items():
+        expected = agent.rank_articles_for_user(profile, ARTICLES, top_k=k)
+        assert [(item['article']['url'], item['score']) for item in feeds[user_id]] == \
+            [(item['article']['url'], pytest.approx(item['score'])) for item in expected]
+
+
+def test_negative_k_selects_nothing():
+    assert score_feeds(PROFILES, ARTICLES, k=-1) == {user_id: [] for user_id in PROFILES}
@@ -0,0 +1,46 @@
+# tests/test_dedupe.py
+
+import copy
+
+from dedupe import cluster_near_duplicates, NearDuplicateIndex
+
+STORY = " ".join(f"word{i}" for i in range(200))
+OTHER_STORY = " ".join(f"other{i}" for i in range(200))
+
+
+def make_articles():
+    return [
+        {'url': 'short-copy', 'clean_content': STORY},
+        {'url': 'other', 'clean_content': OTHER_STORY},
+        # The same story with a longer footer, seen later
+        {'url': 'long-copy', 'clean_content': STORY + " Reporting by the wire desk."},
+    ]
+
+
+def test_batch_keeps_the_first_copy():
+    representatives, duplicates = cluster_near_duplicates(make_articles())
+    assert [a['url'] for a in representatives] == ['short-copy', 'other']
+    assert [a['url'] for a in duplicates] == ['long-copy']
+    assert duplicates[0]['duplicate_of'] == 'short-copy'
+    assert duplicates[0]['cluster_id'] == representatives[0]['cluster_id']
+    assert representatives[0]['cluster_id'] != representatives[1]['cluster_id']
+
+
+def test_batch_and_streaming_agree():
+    batch = make_articles()
+    cluster_near_duplicates(batch)
+
+    streamed = make_articles()
+    index = NearDuplicateIndex()
+    for article in streamed:
+        index.add(article)
+
+    strip = lambda articles: [{k: a.get(k) for k in ('url', 'cluster_id', 'duplicate_of')} for a in articles]
+    assert strip(batch) == strip(streamed)
+
+
+def test_cluster_ids_are_stable_across_runs():
+    first, second = make_articles(), copy.deepcopy(make_articles())
+    cluster_near_duplicates(first)
+    cluster_near_duplicates(second)
+    assert [a['cluster_id'] for a in first] == [a['cluster_id'] for a in second]
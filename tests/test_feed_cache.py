@@ -0,0 +1,135 @@
+# tests/test_feed_cache.py
+
+import asyncio
+
+from agent4_personalizer import PersonalizationAgent
+from feed_cache import FeedCache
+
+PROFILE = {'categories': {'Technology': 2.0}, 'entities': {'Google': 1.0}}
+
+
+class ArticleStore:
+    """The `articles` table as get_recent_articles sees it, with updated_at set on every write."""
+
+    def __init__(self):
+        self.rows = {}
+        self.clock = 0
+
+    def upsert(self, url, category='General', entities=None, created_at=None, stamp=None):
+        if stamp is None:
+            self.clock += 1
+            stamp = f"{self.clock:06d}"
+        previous = self.rows.get(url, {})
+        self.rows[url] = {
+            'url': url,
+            'category': category,
+            'entities': entities or {},
+            'created_at': created_at or previous.get('created_at') or stamp,
+            'updated_at': stamp,
+        }
+
+    async def fetch(self, since, limit):
+        rows = list(self.rows.values())
+        if since:
+            rows = sorted((r for r in rows if r['updated_at'] >= since), key=lambda r: r['updated_at'])
+        else:
+            rows.sort(key=lambda r: r['created_at'], reverse=True)
+        return [dict(r) for r in rows[:limit]]
+
+
+def make_cache(store, feed_size=3, max_candidates=5):
+    async def fetch_profile(user_id):
+        return PROFILE
+    return FeedCache(PersonalizationAgent(), fetch_profile, store.fetch, feed_size, max_candidates)
+
+
+def get_feed(cache):
+    cache.window.mark_stale()
+    return [item['article']['url'] for item in asyncio.run(cache.get_feed('user-1'))]
+
+
+def full_rank(cache):
+    ranked = PersonalizationAgent().rank_articles_for_user(PROFILE, cache.window.articles, top_k=cache.feed_size)
+    return [item['article']['url'] for item in ranked]
+
+
+def test_new_articles_are_merged_into_cached_feed():
+    store = ArticleStore()
+    for i in range(4):
+        store.upsert(f"a{i}")
+    cache = make_cache(store)
+    assert get_feed(cache) == ['a3', 'a2', 'a1']
+
+    store.upsert('tech', category='Technology')
+    assert get_feed(cache) == ['tech', 'a3', 'a2'] == full_rank(cache)
+
+
+def test_updated_article_replaces_its_old_copy():
+    store = ArticleStore()
+    for i in range(4):
+        store.upsert(f"a{i}")
+    cache = make_cache(store)
+    get_feed(cache)
+
+    # Re-tagged by the pipeline: same url and created_at, new category
+    store.upsert('a0', category='Technology')
+    assert get_feed(cache)[0] == 'a0'
+    assert [a['url'] for a in cache.window.articles].count('a0') == 1
+    assert get_feed(cache) == full_rank(cache)
+
+
+def test_ranked_article_that_is_updated_down_is_dropped():
+    store = ArticleStore()
+    store.upsert('tech', category='Technology')
+    for i in range(4):
+        store.upsert(f"a{i}")
+    cache = make_cache(store)
+    assert get_feed(cache)[0] == 'tech'
+
+    store.upsert('tech', category='General')
+    assert get_feed(cache) == full_rank(cache) == ['a3', 'a2', 'a1']
+
+
+def test_articles_that_leave_the_window_leave_the_feed():
+    store = ArticleStore()
+    store.upsert('tech', category='Technology')
+    store.upsert('old')
+    cache = make_cache(store, max_candidates=5)
+    assert get_feed(cache)[0] == 'tech'
+
+    for i in range(5):
+        store.upsert(f"new{i}")
+    feed = get_feed(cache)
+    assert 'tech' not in [a['url'] for a in cache.window.articles]
+    assert 'tech' not in feed
+    assert feed == full_rank(cache)
+
+
+def test_more_changes_than_one_page_with_a_shared_timestamp():
+    store = ArticleStore()
+    for i in range(3):
+        store.upsert(f"a{i}")
+    cache = make_cache(store, feed_size=5, max_candidates=5)
+    get_feed(cache)
+
+    # One upsert statement stamps all its rows alike, and there are more than a page of them
+    store.upsert('x0', stamp='000100')
+    for i in range(1, 7):
+        store.upsert(f"x{i}", created_at=f"00010{i}", stamp='000200')
+    store.upsert('tech', category='Technology', created_at='000199', stamp='000200')
+    assert get_feed(cache)[0] == 'tech'
+
+    # Nothing new: the rows at the watermark come back but don't count as changes
+    version = cache.window.version
+    get_feed(cache)
+    assert cache.window.version == version
+
+
+def test_incremental_feed_matches_full_rank_after_many_changes():
+    store = ArticleStore()
+    cache = make_cache(store, feed_size=4, max_candidates=8)
+    categories = ['Technology', 'General', 'Sports']
+    for step in range(40):
+        store.upsert(f"a{step % 11}", category=categories[step % 3],
+                     entities={'ORG': ['Google']} if step % 5 == 0 else {})
+        assert get_feed(cache) == full_rank(cache)
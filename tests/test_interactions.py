@@ -0,0 +1,159 @@
+# tests/test_interactions.py
+
+import asyncio
+import copy
+from types import SimpleNamespace
+
+from interactions import InteractionBuffer
+
+ARTICLES = {
+    'tech': {'url': 'tech', 'category': 'Technology', 'entities': {'ORG': ['Google']}},
+    'sport': {'url': 'sport', 'category': 'Sports', 'entities': {}},
+}
+
+
+class FakeRepository:
+    """
+    Profiles with compare-and-swap writes, like the save_interest_profiles function.
+    `concurrent_writes` bumps those users' rows on the next save, as another API instance
+    would; `fail_on_save` makes that save call (1-based) fail without writing anything.
+    """
+
+    def __init__(self, profiles=None, concurrent_writes=(), fail_on_save=None):
+        self.profiles = copy.deepcopy(profiles or {})
+        self.concurrent_writes = set(concurrent_writes)
+        self.fail_on_save = fail_on_save
+        self.saves = 0
+
+    async def get_articles_by_url(self, urls):
+        return {url: ARTICLES[url] for url in urls if url in ARTICLES}
+
+    async def get_interest_profiles(self, user_ids):
+        return {user_id: copy.deepcopy(self.profiles[user_id]) for user_id in user_ids if user_id in self.profiles}
+
+    async def save_interest_profiles(self, profiles_by_user, expected_versions):
+        # A round trip: other requests run meanwhile
+        await asyncio.sleep(0)
+        self.saves += 1
+        if self.saves == self.fail_on_save:
+            raise ConnectionError("connection reset")
+        for user_id in self.concurrent_writes:
+            profile = self.profiles.setdefault(user_id, {'categories': {}, 'entities': {}})
+            profile['version'] = profile.get('version', 0) + 1
+        self.concurrent_writes = set()
+
+        conflicts = set()
+        for user_id, profile in profiles_by_user.items():
+            stored = self.profiles.get(user_id)
+            if (None if stored is None else stored.get('version', 0)) != expected_versions[user_id]:
+                conflicts.add(user_id)
+            else:
+                self.profiles[user_id] = copy.deepcopy(profile)
+        return conflicts
+
+
+class FakeFeedCache:
+    def __init__(self):
+        self.window = SimpleNamespace(articles=[])
+        self.invalidated = []
+
+    def invalidate(self, user_id):
+        self.invalidated.append(user_id)
+
+
+def make_buffer(repository, feed_cache=None, max_per_user=50):
+    return InteractionBuffer(repository, feed_cache, flush_seconds=3600, max_pending=1000, max_per_user=max_per_user)
+
+
+def test_flush_applies_interactions_and_invalidates_feeds():
+    async def main():
+        repository, feed_cache = FakeRepository(), FakeFeedCache()
+        buffer = make_buffer(repository, feed_cache)
+        buffer.add('alice', 'tech', now=1000)
+        buffer.add('alice', 'sport', now=1001)
+        buffer.add('bob', 'sport', now=1000)
+        return repository, feed_cache, await buffer.flush()
+
+    repository, feed_cache, updated = asyncio.run(main())
+    assert updated == 2
+    assert repository.saves == 1
+    assert repository.profiles['alice']['categories'] == {'Technology': 1.0, 'Sports': 1.0}
+    assert repository.profiles['alice']['entities'] == {'Google': 0.5}
+    assert repository.profiles['alice']['version'] == 1
+    assert sorted(feed_cache.invalidated) == ['alice', 'bob']
+
+
+def test_per_user_cap():
+    async def main():
+        buffer = make_buffer(FakeRepository(), max_per_user=2)
+        results = [buffer.add('alice', 'tech', now=1000 + i) for i in range(3)]
+        return results, buffer.add('bob', 'tech', now=1000)
+
+    results, other_user = asyncio.run(main())
+    assert results == [True, True, False]
+    assert other_user
+
+
+def test_conflicting_profile_is_reread_and_updated_again():
+    profiles = {'alice': {'categories': {'Sports': 1.0}, 'entities': {}, 'version': 4}}
+
+    async def main():
+        repository = FakeRepository(profiles, concurrent_writes={'alice'})
+        buffer = make_buffer(repository)
+        buffer.add('alice', 'tech', now=1000)
+        return repository, await buffer.flush()
+
+    repository, updated = asyncio.run(main())
+    assert updated == 1
+    assert repository.saves == 2
+    # Written on top of the other instance's version, not over it
+    assert repository.profiles['alice']['version'] == 6
+    assert repository.profiles['alice']['categories']['Technology'] == 1.0
+
+
+def test_failure_mid_flush_requeues_only_users_not_yet_written():
+    async def main():
+        # The first save writes alice and carol but conflicts on bob, then bob's retry fails
+        repository = FakeRepository(concurrent_writes={'bob'}, fail_on_save=2)
+        buffer = make_buffer(repository)
+        buffer.add('alice', 'tech', now=1000)
+        buffer.add('bob', 'tech', now=1000)
+        buffer.add('carol', 'sport', now=1000)
+        first = await buffer.flush()
+        pending = {user_id: list(events) for user_id, events in buffer._pending.items()}
+        second = await buffer.flush()
+        if buffer._timer is not None:
+            buffer._timer.cancel()
+        return repository, first, pending, second
+
+    repository, first, pending, second = asyncio.run(main())
+    assert first == 0
+    # alice and carol were written by the first save; only bob's interaction waits
+    assert pending == {'bob': [(1000, 'tech')]}
+    assert second == 1
+    assert repository.profiles['alice']['categories'] == {'Technology': 1.0}
+    assert repository.profiles['carol']['categories'] == {'Sports': 1.0}
+    assert repository.profiles['bob']['categories'] == {'Technology': 1.0}
+
+
+def test_requeue_after_a_failed_flush_respects_the_per_user_cap():
+    async def main():
+        repository = FakeRepository(fail_on_save=1)
+        buffer = make_buffer(repository, max_per_user=3)
+        buffer.add('alice', 'tech', now=1000)
+        buffer.add('bob', 'tech', now=1000)
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        # Arrive while the flush is writing
+        buffer.add('alice', 'sport', now=1001)
+        buffer.add('alice', 'sport', now=1002)
+        buffer.add('alice', 'sport', now=1003)
+        await flush
+        if buffer._timer is not None:
+            buffer._timer.cancel()
+        return buffer._pending
+
+    pending = asyncio.run(main())
+    # Failed events go back in front of newer ones, but only as far as the per-user cap allows
+    assert pending['alice'] == [(1001, 'sport'), (1002, 'sport'), (1003, 'sport')]
+    assert pending['bob'] == [(1000, 'tech')]
@@ -0,0 +1,51 @@
+# tests/test_personalizer.py
+
+import pytest
+
+from agent4_personalizer import decay_profile, prune_profile, record_user_interaction
+
+DAY = 86400
+
+
+def test_decay_halves_weights_after_one_half_life():
+    profile = {'categories': {'Technology': 2.0}, 'entities': {'Google': 1.0}, 'updated_at': 0}
+    decay_profile(profile, now=14 * DAY, half_life_days=14)
+    assert profile['categories']['Technology'] == pytest.approx(1.0)
+    assert profile['entities']['Google'] == pytest.approx(0.5)
+    assert profile['updated_at'] == 14 * DAY
+
+
+def test_decay_keeps_the_relative_order_of_weights():
+    profile = {'categories': {'A': 3.0, 'B': 1.0}, 'entities': {}, 'updated_at': 0}
+    decay_profile(profile, now=3 * DAY, half_life_days=14)
+    assert profile['categories']['A'] / profile['categories']['B'] == pytest.approx(3.0)
+
+
+def test_decay_without_updated_at_or_with_an_older_now_changes_nothing():
+    fresh = {'categories': {'A': 1.0}, 'entities': {}}
+    decay_profile(fresh, now=100)
+    assert fresh == {'categories': {'A': 1.0}, 'entities': {}, 'updated_at': 100}
+
+    # Interactions can be applied out of order; the clock never goes back
+    profile = {'categories': {'A': 1.0}, 'entities': {}, 'updated_at': 200}
+    decay_profile(profile, now=100)
+    assert profile == {'categories': {'A': 1.0}, 'entities': {}, 'updated_at': 200}
+
+
+def test_prune_drops_weak_weights_and_caps_entities():
+    profile = {
+        'categories': {'Technology': 1.23456, 'Sports': 0.01},
+        'entities': {'A': 3.0, 'B': 2.0, 'C': 1.0, 'D': 0.01},
+    }
+    prune_profile(profile, min_weight=0.05, max_entities=2)
+    assert profile['categories'] == {'Technology': 1.2346}
+    assert profile['entities'] == {'A': 3.0, 'B': 2.0}
+
+
+def test_record_user_interaction_decays_then_adds_and_prunes():
+    profile = {'categories': {'Sports': 0.08}, 'entities': {}, 'updated_at': 0}
+    article = {'category': 'Technology', 'entities': {'ORG': ['Google'], 'PER': ['Ada']}}
+    record_user_interaction(profile, article, now=14 * DAY)
+    # Sports decayed to 0.04, below the minimum weight
+    assert profile['categories'] == {'Technology': 1.0}
+    assert profile['entities'] == {'Google': 0.5, 'Ada': 0.5}
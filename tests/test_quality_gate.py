@@ -0,0 +1,40 @@
+# tests/test_quality_gate.py
+
+import pytest
+
+import harvester
+from harvester import FetchResult
+from quality_gate import rejection_reason
+
+BODY = " ".join(f"word{i}" for i in range(400))
+
+
+@pytest.mark.parametrize('result', [
+    FetchResult(False, None, 200, 'no_content'),
+    FetchResult(False, None, 503, 'http_error'),
+    FetchResult(False, None, None, 'exception', "connection reset"),
+])
+def test_rejects_what_the_harvester_returns_for_failed_fetches(monkeypatch, result):
+    monkeypatch.setattr(harvester, 'fetch_article', lambda url: result)
+    content = harvester.fetch_full_article_text("https://example.com/story")
+    assert rejection_reason({'content': content}) == 'fetch_error'
+
+
+@pytest.mark.parametrize('content', [
+    "Error: Could not generate summary. quota exceeded",
+    "Error fetching from API: Status Code 500",
+])
+def test_rejects_error_sentinels(content):
+    assert rejection_reason({'content': content}) == 'fetch_error'
+
+
+@pytest.mark.parametrize('opening', ["Error", "Errors", "Error-prone"])
+def test_keeps_real_articles_that_start_with_error(opening):
+    content = f"{opening} rates in the new census data were lower than expected. {BODY}"
+    assert rejection_reason({'content': content}) is None
+
+
+def test_rejects_empty_short_and_boilerplate_pages():
+    assert rejection_reason({'content': "   "}) == 'empty'
+    assert rejection_reason({'content': "Just a few words."}) == 'too_short'
+    assert rejection_reason({'content': "Please enable JavaScript to continue. " * 20}) == 'boilerplate'
@@ -0,0 +1,69 @@
+# tests/test_url_index.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from url_index import SeenURLIndex, content_hash, record_known_urls, drop_unchanged_articles, is_unchanged_article
+
+
+class ArticlesTable:
+    """Answers the `select(...).in_('url', ...)` lookup record_known_urls makes on `articles`."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        self.columns = columns.split(',')
+        return self
+
+    def in_(self, column, values):
+        self.urls = set(values)
+        return self
+
+    def execute(self):
+        self.queries += 1
+        return SimpleNamespace(data=[
+            {c: row.get(c) for c in self.columns} for row in self.rows if row['url'] in self.urls
+        ])
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SeenURLIndex(str(tmp_path / "seen.sqlite3"))
+
+
+def article(url, content):
+    return {'url': url, 'content': content}
+
+
+def test_fresh_index_skips_articles_stored_with_the_same_content(index):
+    supabase = ArticlesTable([{'url': 'a', 'content_hash': content_hash("same")}])
+    record_known_urls(['a', 'b'], supabase, index)
+
+    kept = drop_unchanged_articles([article('a', "same"), article('b', "new")], index)
+    assert [a['url'] for a in kept] == ['b']
+
+
+def test_fresh_index_reprocesses_articles_that_changed(index):
+    supabase = ArticlesTable([{'url': 'a', 'content_hash': content_hash("before")}])
+    record_known_urls(['a'], supabase, index)
+    assert not is_unchanged_article(article('a', "after"), index)
+
+
+def test_rows_stored_without_a_hash_count_as_changed(index):
+    supabase = ArticlesTable([{'url': 'a', 'content_hash': None}])
+    record_known_urls(['a'], supabase, index)
+    assert not is_unchanged_article(article('a', "anything"), index)
+
+
+def test_known_urls_are_not_looked_up_again(index):
+    index.add_articles([article('a', "same")])
+    supabase = ArticlesTable([])
+    record_known_urls(['a'], supabase, index)
+    assert supabase.queries == 0
+    assert is_unchanged_article(article('a', "same"), index)
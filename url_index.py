@@ -0,0 +1,130 @@
+# url_index.py
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# --- CONFIGURATION ---
+SEEN_URL_INDEX_PATH = os.environ.get(
+    "SEEN_URL_INDEX_PATH", os.path.join(tempfile.gettempdir(), "ai-agent-cache", "seen_urls.sqlite3")
+)
+# PostgREST puts the URL list in the query string, so we look them up in chunks
+STORE_LOOKUP_CHUNK_SIZE = 100
+
+
+def content_hash(text):
+    """Returns a stable fingerprint of an article's raw content."""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+class SeenURLIndex:
+    """
+    A local sqlite index of article URLs we have already processed (stored in the
+    `articles` table, or skipped as a near-duplicate of a stored story), together
+    with the hash of their content.
+    It lets us skip known articles without asking Supabase every time.
+    """
+
+    def __init__(self, path=None):
+        path = path or SEEN_URL_INDEX_PATH
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY, content_hash TEXT, seen_at REAL)"
+        )
+        self._conn.commit()
+
+    def get_hashes(self, urls):
+        """Returns {url: content_hash} for the URLs the index already knows about."""
+        urls = list(urls)
+        found = {}
+        with self._lock:
+            # Stay well under sqlite's limit on bound parameters
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT url, content_hash FROM seen_urls WHERE url IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def add(self, records):
+        """Records (url, content_hash) pairs. A hash of None keeps whatever hash we already had."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO seen_urls (url, content_hash, seen_at) VALUES (?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    content_hash = COALESCE(excluded.content_hash, seen_urls.content_hash),
+                    seen_at = excluded.seen_at
+                """,
+                [(url, digest, now) for url, digest in records],
+            )
+            self._conn.commit()
+
+    def add_articles(self, articles):
+        """Marks a batch of processed articles as seen."""
+        self.add((a['url'], a.get('content_hash') or content_hash(a.get('content'))) for a in articles)
+
+
+def fetch_stored_hashes(supabase, urls):
+    """Returns {url: content_hash} for the subset of `urls` that already exist in the `articles` table."""
+    urls = list(urls)
+    stored = {}
+    for i in range(0, len(urls), STORE_LOOKUP_CHUNK_SIZE):
+        chunk = urls[i:i + STORE_LOOKUP_CHUNK_SIZE]
+        response = supabase.table('articles').select('url,content_hash').in_('url', chunk).execute()
+        stored.update((row['url'], row.get('content_hash')) for row in response.data)
+    return stored
+
+
+def record_known_urls(urls, supabase, index):
+    """
+    Makes sure the local index knows the stored content hash of every harvested URL, so a
+    fresh index (e.g. a new runner) still skips articles whose content hasn't changed.
+    URLs the index doesn't know are looked up in Supabase. Rows stored before the table had
+    a `content_hash` are left out: they count as changed once and get their hash when re-stored.
+    Every URL is still fetched; the HTTP cache revalidates known pages with a conditional GET.
+    """
+    urls = list(urls)
+    known = set(index.get_hashes(urls))
+    unknown = [url for url in urls if url not in known]
+    if not unknown or supabase is None:
+        return
+
+    try:
+        stored = fetch_stored_hashes(supabase, unknown)
+    except Exception as e:
+        # If the lookup fails we just process everything, the upsert still dedupes on url
+        print(f"Could not check stored URLs, processing all of them: {e}")
+        return
+    hashed = [(url, digest) for url, digest in stored.items() if digest]
+    if hashed:
+        index.add(hashed)
+    print(f"Incremental mode: {len(unknown) - len(stored)} new URLs, {len(known) + len(hashed)} with a known content hash.")
+
+
+def is_unchanged_article(article, index):
+    """True if a fetched article is already stored with identical content. Sets its content_hash."""
+    article['content_hash'] = content_hash(article.get('content'))
+    return index.get_hashes([article['url']]).get(article['url']) == article['content_hash']
+
+
+def drop_unchanged_articles(articles, index):
+    """Drops fetched articles whose content is identical to what we stored last time."""
+    previous = index.get_hashes(a['url'] for a in articles)
+    changed = []
+    for article in articles:
+        article['content_hash'] = content_hash(article.get('content'))
+        if previous.get(article['url']) != article['content_hash']:
+            changed.append(article)
+    skipped = len(articles) - len(changed)
+    if skipped:
+        print(f"Skipping {skipped} articles whose content has not changed.")
+    return changed